@@ -2,28 +2,38 @@ from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File,
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import StreamingResponse
 from app.utils.conversation import get_conversation_history, get_or_create_conversation, update_conversation_history
-from app.utils.process_files import process_pdf, process_svg, process_text_file
+from app.utils.process_files import ALLOWED_EXTENSIONS, iter_document_text
+from app.utils.uploads import (
+    BULK_UPLOAD_MAX_BYTES, UPLOAD_MAX_BYTES, remove_staged_files, save_upload, spool_upload, staging_dir
+)
 from app.db.models import (
     QARequest, ScrapeRequest, UserCreate, UserLogin, User, Token, 
     ChatbotCreate, ChatbotInfo, FileUploadRequest, UserChatbotsResponse
 )
 from app.services.gemini import ask_gemini, enhanced_query_with_gemini, translate_to_english
-from app.services.embeddings import get_embeddings, get_question_embedding
-from app.utils.common import clean_text, crawl_website, create_chunks
-from app.db.qdrant import ingest_to_qdrant
+from app.services.gemini_client import gemini_stats
+from app.services.embeddings import get_question_embedding
+from app.services.chunking import chunk_stream
+from app.db.jobs import JOB_BULK_UPLOAD, JOB_REINGEST, JOB_SCRAPE, FINISHED_STATUSES, enqueue_job, get_job, get_tenant_queue, new_job_id
+from app.services.ingest import chunk_hash, ingest_source_diff
+from app.services.bulk_upload import file_extension as get_file_extension
+from app.db.uploaded_files import delete_uploaded_file, get_uploaded_file, save_uploaded_file
+from app.services.job_stream import stream_job
+from app.utils.archive import list_archives
+from app.services.recrawl import RECRAWL_MAX_PAGES
+from app.db.qdrant import get_source_vectors
 from app.auth.auth import (
     get_password_hash, verify_password, create_access_token,
     get_current_active_user, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from app.db.mysql import get_db
 import logging
-from typing import Dict, List, Optional
+import os
+from typing import List, Optional
 import asyncio
 from datetime import datetime, timedelta
-import hashlib
 import uuid
 import traceback
-import json
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,18 +41,6 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Store scraping progress with last update time
-scraping_progress: Dict[str, dict] = {}
-
-# Allowed file types
-ALLOWED_EXTENSIONS = {
-    'pdf': 'application/pdf',
-    'svg': 'image/svg+xml',
-    'txt': 'text/plain',
-    'doc': 'application/msword',
-    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-}
-
 @router.post("/signup", response_model=User)
 async def signup(user: UserCreate, db = Depends(get_db)):
     """Create a new user account."""
@@ -347,66 +345,81 @@ async def upload_and_process(
                 detail=f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS.keys())}"
             )
 
-        # Read file content
+        # Hash and measure the spooled upload in chunks, enforcing the size limit
         try:
-            file_content = await file.read()
-            if not file_content:
-                raise HTTPException(status_code=400, detail="Empty file received")
+            upload = await spool_upload(file)
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error reading file: {str(e)}")
             raise HTTPException(status_code=400, detail=f"Error reading file: {str(e)}")
+        if not upload.size:
+            raise HTTPException(status_code=400, detail="Empty file received")
+        logger.info(f"Received {file.filename}: {upload.size} bytes, sha256 {upload.sha256}")
+
+        # A byte-identical re-upload whose points are still stored is a no-op
+        previous = await asyncio.to_thread(get_uploaded_file, collection_name, file.filename)
+        if previous and not await asyncio.to_thread(get_source_vectors, collection_name, file.filename, [0]):
+            previous = None
+        if previous and previous['content_hash'] == upload.sha256:
+            logger.info(f"{file.filename} is unchanged in collection {collection_name}; skipping")
+            return {
+                "status": "unchanged",
+                "message": "File is identical to the stored version; nothing was re-processed",
+                "collection_name": collection_name,
+                "chunks_created": 0,
+                "file_name": file.filename,
+                "sha256": upload.sha256
+            }
         
-        # Process file based on type
-        text_content = ""
+        # Extract and chunk off the event loop; extractors read from the spooled file
+        # and PDF pages stream into the chunker as worker processes extract them
+        def extract_chunks() -> List[str]:
+            return [chunk for chunk in chunk_stream(iter_document_text(upload.file, file_extension)) if chunk.strip()]
+
         try:
-            if file_extension == 'pdf':
-                text_content = process_pdf(file_content)
-            elif file_extension == 'svg':
-                text_content = process_svg(file_content)
-            else:
-                text_content = process_text_file(file_content)
+            chunks = await asyncio.to_thread(extract_chunks)
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error processing file content: {str(e)}")
             raise HTTPException(status_code=400, detail=f"Error processing file content: {str(e)}")
 
-        if not text_content.strip():
+        if not chunks:
             logger.warning("No text content extracted from file")
             raise HTTPException(status_code=400, detail="No text content could be extracted from the file")
+        logger.info(f"Created {len(chunks)} chunks from text")
 
-        # Create chunks from the text
+        # Embed and ingest to Qdrant
         try:
-            chunks = create_chunks(text_content, chunk_size=1000, overlap=200)
-            logger.info(f"Created {len(chunks)} chunks from text")
-            
-            # Validate chunks
-            valid_chunks = [chunk for chunk in chunks if chunk.strip()]
-            if len(valid_chunks) != len(chunks):
-                logger.warning(f"Filtered out {len(chunks) - len(valid_chunks)} empty chunks")
-                chunks = valid_chunks
-                
-            if not chunks:
-                raise HTTPException(status_code=400, detail="No valid text chunks could be created from the file")
-                
-        except Exception as e:
-            logger.error(f"Error creating chunks: {str(e)}")
-            raise HTTPException(status_code=400, detail=f"Error creating text chunks: {str(e)}")
-
-        # Generate embeddings
-        try:
-            embeddings = get_embeddings(chunks)
-            if not embeddings or len(embeddings) != len(chunks):
-                raise Exception("Embedding generation failed or produced mismatched results")
-            logger.info(f"Generated {len(embeddings)} embeddings")
-        except Exception as e:
-            logger.error(f"Error generating embeddings: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error generating embeddings: {str(e)}")
-
-        # Ingest to Qdrant
-        try:
-            ingest_to_qdrant(collection_name, chunks, embeddings)
-            logger.info(f"Successfully ingested {len(chunks)} chunks to collection {collection_name}")
+            # Chunks are linked to the file and their position so retrieval can fetch neighbours.
+            # A changed file is diffed against its previous chunks so only new text is embedded;
+            # its record is dropped while the points are rewritten, so a failure means a full replace next time
+            if previous:
+                await asyncio.to_thread(delete_uploaded_file, collection_name, file.filename)
+            # Shares this API process's embed/upsert slots fairly with other tenants' uploads; the
+            # scheduler is per process, so crawls and bulk jobs in the workers are not affected
+            counters = await asyncio.to_thread(
+                ingest_source_diff,
+                collection_name,
+                file.filename,
+                chunks,
+                previous['chunk_hashes'] if previous else None,
+                tenant=current_user['id'],
+                interactive=True
+            )
+            await asyncio.to_thread(
+                save_uploaded_file, collection_name, file.filename, upload.sha256, upload.size,
+                [chunk_hash(chunk) for chunk in chunks]
+            )
+            logger.info(
+                f"Successfully ingested {len(chunks)} chunks to collection {collection_name}: "
+                f"{counters['embeddings_done']} embedded, {counters['chunks_reused']} reused, "
+                f"{counters['chunks_unchanged']} unchanged, {counters['chunks_removed']} removed "
+                f"(waited {counters['scheduler_wait_seconds']}s for embed/upsert slots)"
+            )
         except Exception as e:
-            logger.error(f"Error ingesting to Qdrant: {str(e)}")
+            logger.error(f"Error embedding or storing chunks: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error storing data: {str(e)}")
 
         return {
@@ -414,7 +427,11 @@ async def upload_and_process(
             "message": "File processed and stored successfully",
             "collection_name": collection_name,
             "chunks_created": len(chunks),
-            "file_name": file.filename
+            "chunks_embedded": counters['embeddings_done'],
+            "chunks_unchanged": counters['chunks_unchanged'] + counters['chunks_reused'],
+            "chunks_removed": counters['chunks_removed'],
+            "file_name": file.filename,
+            "sha256": upload.sha256
         }
 
     except HTTPException as he:
@@ -424,11 +441,59 @@ async def upload_and_process(
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@router.post("/bulk-upload")
+async def bulk_upload(
+    files: List[UploadFile] = File(...),
+    collection_name: Optional[str] = Form(None),
+    current_user = Depends(get_current_active_user)
+):
+    """Upload many files, or zip archives of them, and ingest them as one background job."""
+    if not collection_name:
+        collection_name = f"{current_user['id']}_default"
+
+    for file in files:
+        extension = get_file_extension(file.filename or "")
+        if extension != 'zip' and extension not in ALLOWED_EXTENSIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{file.filename}: file type not allowed. Allowed types: zip, {', '.join(ALLOWED_EXTENSIONS.keys())}"
+            )
+
+    # Stage the files where the workers can read them, then queue one job for all of them
+    task_id = new_job_id()
+    staged = []
+    try:
+        for index, file in enumerate(files):
+            extension = get_file_extension(file.filename)
+            saved = await save_upload(
+                file,
+                os.path.join(staging_dir(task_id), f"{index:05d}.{extension}"),
+                BULK_UPLOAD_MAX_BYTES if extension == 'zip' else UPLOAD_MAX_BYTES
+            )
+            if not saved.size:
+                raise HTTPException(status_code=400, detail=f"{file.filename}: empty file received")
+            staged.append({"name": file.filename, "path": saved.path, "size": saved.size, "sha256": saved.sha256})
+        logger.info(f"Staged {len(staged)} file(s) for bulk upload {task_id} into collection {collection_name}")
+        enqueue_job(task_id, JOB_BULK_UPLOAD, collection_name, None, params={"files": staged}, tenant_id=current_user['id'])
+    except HTTPException:
+        remove_staged_files(task_id)
+        raise
+    except Exception as e:
+        remove_staged_files(task_id)
+        logger.error(f"Error starting bulk upload: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "task_id": task_id,
+        "status": "queued",
+        "collection_name": collection_name,
+        "files": len(staged)
+    }
+
 @router.post("/scrape-and-ingest")
 async def scrape_and_ingest(
     req: ScrapeRequest,
     current_user = Depends(get_current_active_user),
-    background_tasks: BackgroundTasks = None,
     db = Depends(get_db)
 ):
     """Scrape a website and ingest the content into specified collection."""
@@ -438,28 +503,13 @@ async def scrape_and_ingest(
         
         logger.info(f"Starting scrape and ingest for URL: {req.url} to collection: {collection_name}")
         
-        # Generate a unique ID for this scraping task
-        task_id = hashlib.md5(f"{req.url}_{collection_name}_{datetime.now().timestamp()}".encode()).hexdigest()
-        
-        # Initialize progress tracking
-        scraping_progress[task_id] = {
-            "status": "crawling",
-            "start_time": datetime.now(),
-            "last_update": datetime.now(),
-            "pages_scraped": 0,
-            "chunks_created": 0,
-            "error": None,
-            "is_completed": False,
-            "collection_name": collection_name,
-            "url": req.url
-        }
-        
-        # Start background task
-        background_tasks.add_task(process_scraping, req.url, task_id, collection_name)
+        # Queue the job; a worker process (python -m app.worker) crawls and ingests it
+        task_id = new_job_id()
+        enqueue_job(task_id, JOB_SCRAPE, collection_name, str(req.url), tenant_id=current_user['id'])
         
         return {
             "task_id": task_id, 
-            "status": "started",
+            "status": "queued",
             "collection_name": collection_name
         }
         
@@ -467,101 +517,131 @@ async def scrape_and_ingest(
         logger.error(f"Error starting scrape process: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/scraping-progress/{task_id}")
-async def get_scraping_progress(task_id: str):
-    """Get the current progress of a scraping task."""
-    if task_id not in scraping_progress:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Check if we should return cached response
-    current_time = datetime.now()
-    last_update = scraping_progress[task_id]["last_update"]
-    time_diff = (current_time - last_update).total_seconds()
-    
-    # If the task is completed or there's an error, return immediately
-    if scraping_progress[task_id]["is_completed"] or scraping_progress[task_id]["error"]:
-        return scraping_progress[task_id]
-    
-    # If less than 2 seconds have passed since last update, return cached response
-    if time_diff < 2:
-        return scraping_progress[task_id]
-    
-    # Update last update time
-    scraping_progress[task_id]["last_update"] = current_time
-    return scraping_progress[task_id]
-
-async def process_scraping(url: str, task_id: str, collection_name: str):
-    """Background task to process scraping and ingestion."""
+@router.post("/chatbots/{chatbot_id}/recrawl")
+async def recrawl_chatbot(
+    chatbot_id: str,
+    max_pages: Optional[int] = None,
+    current_user = Depends(get_current_active_user),
+    db = Depends(get_db)
+):
+    """Refresh a chatbot's knowledge from its source_url, re-ingesting only changed pages."""
     try:
-        # Update status to crawling
-        update_progress(task_id, "crawling")
-        
-        # Crawl the website WITHOUT LIMIT - will crawl all pages
-        pages = crawl_website(str(url), max_pages=None)  # None means unlimited
-        
-        if not pages:
-            update_progress(task_id, "error", error="No pages could be scraped from the provided URL")
-            return
-        
-        update_progress(task_id, "crawling", pages_scraped=len(pages))
-        
-        # Update status to processing
-        update_progress(task_id, "processing")
-        
-        all_chunks = []
-        
-        # Process each page
-        for url, html in pages.items():
-            if html and isinstance(html, str) and len(html) > 0:
-                cleaned_text = clean_text(html)
-                if cleaned_text.strip():
-                    # Create chunks with size 64
-                    chunks = create_chunks(cleaned_text, chunk_size=64, overlap=10)
-                    all_chunks.extend(chunks)
+        cursor = db.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT * FROM chatbots 
+            WHERE id = %s AND user_id = %s AND is_active = TRUE
+        """, (chatbot_id, current_user['id']))
+        chatbot = cursor.fetchone()
+        cursor.close()
         
-        if not all_chunks:
-            update_progress(task_id, "error", error="No valid text content found to ingest from the website")
-            return
+        if not chatbot:
+            raise HTTPException(status_code=404, detail="Chatbot not found")
+        if not chatbot.get('source_url'):
+            raise HTTPException(status_code=400, detail="Chatbot has no source URL to recrawl")
+        
+        collection_name = chatbot['collection_name']
+        url = chatbot['source_url']
+        logger.info(f"Starting recrawl for URL: {url} to collection: {collection_name}")
+        
+        task_id = new_job_id()
+        enqueue_job(
+            task_id, JOB_SCRAPE, collection_name, url,
+            params={"incremental": True, "max_pages": max_pages or RECRAWL_MAX_PAGES},
+            tenant_id=current_user['id']
+        )
         
-        update_progress(task_id, "processing", chunks_created=len(all_chunks))
+        return {
+            "task_id": task_id,
+            "status": "queued",
+            "collection_name": collection_name
+        }
         
-        # Update status to generating embeddings
-        update_progress(task_id, "generating_embeddings")
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error starting recrawl: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chatbots/{chatbot_id}/reingest")
+async def reingest_chatbot(
+    chatbot_id: str,
+    current_user = Depends(get_current_active_user),
+    db = Depends(get_db)
+):
+    """Re-chunk and re-embed a chatbot's crawled pages from its crawl archives, without re-crawling."""
+    try:
+        cursor = db.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT * FROM chatbots 
+            WHERE id = %s AND user_id = %s AND is_active = TRUE
+        """, (chatbot_id, current_user['id']))
+        chatbot = cursor.fetchone()
+        cursor.close()
         
-        # Generate embeddings
-        embeddings = get_embeddings(all_chunks)
+        if not chatbot:
+            raise HTTPException(status_code=404, detail="Chatbot not found")
         
-        # Update status to storing
-        update_progress(task_id, "storing")
+        collection_name = chatbot['collection_name']
+        if not list_archives(collection_name):
+            raise HTTPException(status_code=404, detail="No crawl archive found for this chatbot")
         
-        # Ingest to Qdrant using specified collection
-        ingest_to_qdrant(collection_name, all_chunks, embeddings)
+        task_id = new_job_id()
+        enqueue_job(task_id, JOB_REINGEST, collection_name, chatbot.get('source_url'), tenant_id=current_user['id'])
         
-        # Update status to completed
-        update_progress(task_id, "completed", 
-                       result={
-                           "collection_name": collection_name,
-                           "pages_scraped": len(pages),
-                           "chunks_created": len(all_chunks)
-                       })
+        return {
+            "task_id": task_id,
+            "status": "queued",
+            "collection_name": collection_name
+        }
         
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error starting re-ingest: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/scraping-progress/{task_id}", deprecated=True)
+async def get_scraping_progress(task_id: str):
+    """Get the current progress of a scraping task.
+
+    Deprecated in favour of /process-status/{task_id}, which streams the
+    same progress as it changes. Kept for dashboards that still poll.
+    """
+    job = await asyncio.to_thread(get_job, task_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return job_progress(job)
+
+def job_progress(job: dict) -> dict:
+    """Progress view of a job, in the shape the dashboard polls for."""
+    return {
+        "status": job['status'],
+        "start_time": job['started_at'] or job['created_at'],
+        "last_update": job['updated_at'],
+        "pages_scraped": 0,
+        "chunks_created": 0,
+        **(job.get('progress') or {}),
+        "error": job['error'],
+        "is_completed": job['status'] in FINISHED_STATUSES,
+        "collection_name": job['collection_name'],
+        "url": job['url'],
+        "attempts": job['attempts'],
+        "result": job.get('result')
+    }
+
+@router.get("/ingest-queue")
+async def get_ingest_queue(current_user = Depends(get_current_active_user)):
+    """Queue depth and wait times of the current user's ingestion jobs."""
+    try:
+        return await asyncio.to_thread(get_tenant_queue, current_user['id'])
     except Exception as e:
-        logger.error(f"Error in scraping process: {e}")
-        update_progress(task_id, "error", error=str(e))
-
-def update_progress(task_id: str, status: str, **kwargs):
-    """Update progress with new status and optional data."""
-    if task_id not in scraping_progress:
-        return
-        
-    scraping_progress[task_id].update({
-        "status": status,
-        "last_update": datetime.now(),
-        **kwargs
-    })
-    
-    if status in ["completed", "error"]:
-        scraping_progress[task_id]["is_completed"] = True
+        logger.error(f"Error reading ingest queue: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/gemini-stats")
+async def get_gemini_stats(current_user = Depends(get_current_active_user)):
+    """Latency and token counts of this API process's Gemini calls, per call type."""
+    return gemini_stats()
 
 @router.post("/ask-question")
 async def ask_question(req: QARequest, db=Depends(get_db)):
@@ -587,12 +667,10 @@ async def ask_question(req: QARequest, db=Depends(get_db)):
             limit=5
         )
 
-        # Step 3: Ask Gemini with the full context and results
+        # Step 3: Ask Gemini with the compact context text
         final_response = ask_gemini(
-            enhanced_results.get("context_text", ""),  # context string
+            enhanced_results.get("context_text", ""),  # deduplicated context text
             req.question,                              # user question
-            enhanced_results.get("processed_query", {}),  # parsed search info
-            enhanced_results,                          # full result dict
             conversation_history                       # conversation history
         )
 
@@ -617,80 +695,13 @@ async def ask_question(req: QARequest, db=Depends(get_db)):
 
 @router.get("/process-status/{task_id}")
 async def process_status(task_id: str):
-    async def generate():
-        # Initial state
-        states = {
-            'crawling': {
-                'status': 'pending',
-                'message': 'Waiting to start crawling...',
-                'progress': 0
-            },
-            'processing': {
-                'status': 'pending',
-                'message': 'Waiting to start processing...',
-                'progress': 0
-            },
-            'generating_embeddings': {
-                'status': 'pending',
-                'message': 'Waiting to generate embeddings...',
-                'progress': 0
-            },
-            'storing': {
-                'status': 'pending',
-                'message': 'Waiting to store data...',
-                'progress': 0
-            },
-            'completed': {
-                'status': 'pending',
-                'message': 'Waiting for completion...',
-                'progress': 0
-            }
-        }
-        
-        current_state = 'crawling'
-        total_steps = len(states)
-        
-        try:
-            # Simulate processing steps
-            for step in states.keys():
-                current_state = step
-                states[step]['status'] = 'active'
-                states[step]['message'] = f'Starting {step.replace("_", " ")}...'
-                states[step]['progress'] = 0
-                
-                # Send initial state
-                yield f"data: {json.dumps({'states': states, 'current_state': current_state})}\n\n"
-                
-                # Simulate progress for current step
-                for progress in range(0, 101, 10):
-                    states[step]['progress'] = progress
-                    states[step]['message'] = f'{step.replace("_", " ").title()}: {progress}% complete'
-                    
-                    # Log to terminal
-                    print(f"[{datetime.now().strftime('%H:%M:%S')}] {step}: {progress}% - {states[step]['message']}")
-                    
-                    yield f"data: {json.dumps({'states': states, 'current_state': current_state})}\n\n"
-                    await asyncio.sleep(0.5)  # Use asyncio.sleep instead of time.sleep
-                
-                # Mark step as completed
-                states[step]['status'] = 'completed'
-                states[step]['message'] = f'{step.replace("_", " ").title()} completed'
-                states[step]['progress'] = 100
-                
-                yield f"data: {json.dumps({'states': states, 'current_state': current_state})}\n\n"
-                
-                if step != 'completed':
-                    await asyncio.sleep(1)  # Use asyncio.sleep instead of time.sleep
-            
-            # Send final completion message
-            yield f"data: {json.dumps({'states': states, 'current_state': 'completed', 'is_complete': True})}\n\n"
-            
-        except Exception as e:
-            print(f"Error in process_status: {str(e)}")
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
-    
+    """Live progress of a job as server-sent events, until it completes or fails."""
+    job = await asyncio.to_thread(get_job, task_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Task not found")
+
     return StreamingResponse(
-        generate(),
+        stream_job(task_id),
         media_type='text/event-stream',
         headers={
             'Cache-Control': 'no-cache',
@@ -0,0 +1,65 @@
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from app.db.mysql import get_db_connection
+
+
+def _url_hash(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+def get_page_states(collection_name: str) -> Dict[str, dict]:
+    """Get the stored ETag, Last-Modified and content hash of every crawled page in a collection."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT url, etag, last_modified, content_hash FROM crawled_pages
+            WHERE collection_name = %s
+        """, (collection_name,))
+        rows = cursor.fetchall()
+        cursor.close()
+        return {row['url']: row for row in rows}
+    finally:
+        connection.close()
+
+def save_page_states(
+    collection_name: str,
+    pages: List[Tuple[str, Optional[str], Optional[str], Optional[str]]]
+) -> None:
+    """Upsert (url, etag, last_modified, content_hash) rows for crawled pages."""
+    if not pages:
+        return
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.executemany("""
+            INSERT INTO crawled_pages (collection_name, url_hash, url, etag, last_modified, content_hash)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                etag = VALUES(etag),
+                last_modified = VALUES(last_modified),
+                content_hash = VALUES(content_hash),
+                crawled_at = NOW()
+        """, [
+            (collection_name, _url_hash(url), url, etag, last_modified, content_hash)
+            for url, etag, last_modified, content_hash in pages
+        ])
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+def delete_page_states(collection_name: str, urls: List[str]) -> None:
+    """Forget crawled pages, e.g. after they disappeared from the site."""
+    if not urls:
+        return
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.executemany("""
+            DELETE FROM crawled_pages WHERE collection_name = %s AND url_hash = %s
+        """, [(collection_name, _url_hash(url)) for url in urls])
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
@@ -0,0 +1,322 @@
+import json
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db.mysql import get_db_connection
+
+# Job types
+JOB_SCRAPE = "scrape"
+JOB_REINGEST = "reingest"
+JOB_BULK_UPLOAD = "bulk_upload"
+
+# Job statuses; while a worker runs a job its status is the current stage (crawling, processing, ...)
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_ERROR = "error"
+FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_ERROR)
+
+# Job event types; completed and error end a job's event stream
+EVENT_STAGE = "stage"
+EVENT_PROGRESS = "progress"
+EVENT_COMPLETED = "completed"
+EVENT_ERROR = "error"
+TERMINAL_EVENTS = (EVENT_COMPLETED, EVENT_ERROR)
+
+JSON_COLUMNS = ("params", "progress", "checkpoint", "result")
+
+# (job id, event type, data)
+JobEvent = Tuple[str, str, Dict[str, Any]]
+
+def _decode(row: Optional[dict]) -> Optional[dict]:
+    if row:
+        for column in JSON_COLUMNS:
+            if isinstance(row.get(column), (str, bytes)):
+                row[column] = json.loads(row[column])
+    return row
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+def enqueue_job(
+    job_id: str,
+    job_type: str,
+    collection_name: str,
+    url: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    tenant_id: Optional[str] = None
+) -> None:
+    """Add a job to the queue. tenant_id (the owning user) defaults to the collection."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            INSERT INTO ingest_jobs (id, job_type, collection_name, tenant_id, url, params, status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, (job_id, job_type, collection_name, tenant_id or collection_name, url, json.dumps(params or {}), STATUS_QUEUED))
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+def has_pending_job(collection_name: str) -> bool:
+    """Whether a collection already has a job queued or running."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT 1 FROM ingest_jobs
+            WHERE collection_name = %s AND status NOT IN (%s, %s)
+            LIMIT 1
+        """, (collection_name, *FINISHED_STATUSES))
+        found = cursor.fetchone() is not None
+        cursor.close()
+        return found
+    finally:
+        connection.close()
+
+def get_job(job_id: str) -> Optional[dict]:
+    """Fetch a job with its params, progress, checkpoint and result decoded."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM ingest_jobs WHERE id = %s", (job_id,))
+        job = cursor.fetchone()
+        cursor.close()
+        return _decode(job)
+    finally:
+        connection.close()
+
+def claim_job(worker_id: str, tenant_max_running: int) -> Optional[dict]:
+    """Atomically take the next queued job. Concurrent workers skip rows locked by each other.
+
+    Jobs of the tenant with the fewest running jobs go first (oldest first
+    among equals), and tenants already running tenant_max_running jobs are
+    skipped, so one tenant's backlog cannot occupy every worker. The cap is
+    checked without locking the running jobs, so two workers claiming at
+    the same moment may briefly exceed it by one.
+    """
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        connection.start_transaction()
+        cursor.execute("""
+            SELECT j.id FROM ingest_jobs j
+            LEFT JOIN (
+                SELECT COALESCE(tenant_id, collection_name) AS tenant, COUNT(*) AS running
+                FROM ingest_jobs
+                WHERE status NOT IN (%s, %s, %s)
+                GROUP BY tenant
+            ) r ON r.tenant = COALESCE(j.tenant_id, j.collection_name)
+            WHERE j.status = %s AND COALESCE(r.running, 0) < %s
+            ORDER BY COALESCE(r.running, 0), j.created_at
+            LIMIT 1
+            FOR UPDATE OF j SKIP LOCKED
+        """, (STATUS_QUEUED, *FINISHED_STATUSES, STATUS_QUEUED, tenant_max_running))
+        row = cursor.fetchone()
+        if not row:
+            connection.rollback()
+            cursor.close()
+            return None
+        cursor.execute("""
+            UPDATE ingest_jobs
+            SET status = %s, worker_id = %s, attempts = attempts + 1,
+                heartbeat_at = NOW(), started_at = COALESCE(started_at, NOW())
+            WHERE id = %s
+        """, (STATUS_RUNNING, worker_id, row['id']))
+        cursor.execute("SELECT * FROM ingest_jobs WHERE id = %s", (row['id'],))
+        job = cursor.fetchone()
+        connection.commit()
+        cursor.close()
+        return _decode(job)
+    finally:
+        connection.close()
+
+def _insert_events(cursor, events: List[JobEvent]) -> None:
+    if events:
+        cursor.executemany("""
+            INSERT INTO job_events (job_id, event_type, data) VALUES (%s, %s, %s)
+        """, [(job_id, event_type, json.dumps(data, default=str)) for job_id, event_type, data in events])
+
+def heartbeat_jobs(worker_id: str, progress: Dict[str, dict], events: Optional[List[JobEvent]] = None) -> None:
+    """Record liveness, the latest status and counters of a worker's running jobs, and their new events."""
+    if not progress:
+        return
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.executemany("""
+            UPDATE ingest_jobs
+            SET status = %s, progress = %s, heartbeat_at = NOW()
+            WHERE id = %s AND worker_id = %s AND status NOT IN (%s, %s)
+        """, [
+            (state.get("status", STATUS_RUNNING), json.dumps(state.get("counters", {})), job_id, worker_id, *FINISHED_STATUSES)
+            for job_id, state in progress.items()
+        ])
+        _insert_events(cursor, events or [])
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+def save_checkpoint(job_id: str, checkpoint: Dict[str, Any]) -> None:
+    """Record the stage a job has reached, so a retried job can resume from it."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("UPDATE ingest_jobs SET checkpoint = %s WHERE id = %s", (json.dumps(checkpoint), job_id))
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+def finish_job(job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+    """Mark a job completed or failed and publish the event that ends its stream."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            UPDATE ingest_jobs
+            SET status = %s, result = %s, error = %s, finished_at = NOW(), heartbeat_at = NOW()
+            WHERE id = %s
+        """, (status, json.dumps(result) if result is not None else None, error, job_id))
+        event_type = EVENT_COMPLETED if status == STATUS_COMPLETED else EVENT_ERROR
+        _insert_events(cursor, [(job_id, event_type, {"result": result, "error": error})])
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+def requeue_job(job_id: str) -> None:
+    """Put a job that a worker gave up (e.g. on shutdown) back in the queue."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            UPDATE ingest_jobs SET status = %s, worker_id = NULL
+            WHERE id = %s AND status NOT IN (%s, %s)
+        """, (STATUS_QUEUED, job_id, *FINISHED_STATUSES))
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+def requeue_stale_jobs(stale_seconds: int, max_attempts: int) -> List[str]:
+    """Requeue running jobs whose worker stopped sending heartbeats; fail those out of attempts."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT id, attempts FROM ingest_jobs
+            WHERE status NOT IN (%s, %s, %s)
+              AND heartbeat_at < NOW() - INTERVAL %s SECOND
+        """, (STATUS_QUEUED, *FINISHED_STATUSES, stale_seconds))
+        stale = cursor.fetchall()
+        for job in stale:
+            if job['attempts'] >= max_attempts:
+                error = f"Job abandoned after {job['attempts']} attempts"
+                cursor.execute("""
+                    UPDATE ingest_jobs SET status = %s, error = %s, finished_at = NOW() WHERE id = %s
+                """, (STATUS_ERROR, error, job['id']))
+                _insert_events(cursor, [(job['id'], EVENT_ERROR, {"result": None, "error": error})])
+            else:
+                cursor.execute("""
+                    UPDATE ingest_jobs SET status = %s, worker_id = NULL WHERE id = %s
+                """, (STATUS_QUEUED, job['id']))
+        connection.commit()
+        cursor.close()
+        return [job['id'] for job in stale]
+    finally:
+        connection.close()
+
+def purge_finished_jobs(retention_hours: float) -> int:
+    """Delete completed and failed jobs older than the retention period. Returns the number deleted."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cutoff = int(retention_hours * 3600)
+        cursor.execute("""
+            DELETE FROM job_events WHERE job_id IN (
+                SELECT id FROM ingest_jobs
+                WHERE status IN (%s, %s) AND finished_at < NOW() - INTERVAL %s SECOND
+            )
+        """, (*FINISHED_STATUSES, cutoff))
+        cursor.execute("""
+            DELETE FROM ingest_jobs
+            WHERE status IN (%s, %s) AND finished_at < NOW() - INTERVAL %s SECOND
+        """, (*FINISHED_STATUSES, cutoff))
+        deleted = cursor.rowcount
+        connection.commit()
+        cursor.close()
+        return deleted
+    finally:
+        connection.close()
+
+def get_tenant_queue(tenant_id: str) -> Dict[str, Any]:
+    """Job queue depth and wait times of a tenant.
+
+    Counts its queued and running jobs, how long the oldest queued job has
+    waited, and the seconds its running jobs' batches spent waiting for a
+    fair share of their worker process's embed and upsert slots.
+    """
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT
+                SUM(status = %s) AS queued,
+                SUM(status NOT IN (%s, %s, %s)) AS running,
+                TIMESTAMPDIFF(SECOND, MIN(CASE WHEN status = %s THEN created_at END), NOW()) AS oldest_queued_seconds,
+                SUM(CASE WHEN status NOT IN (%s, %s, %s)
+                    THEN JSON_EXTRACT(progress, '$.scheduler_wait_seconds') END) AS scheduler_wait_seconds
+            FROM ingest_jobs
+            WHERE COALESCE(tenant_id, collection_name) = %s AND status NOT IN (%s, %s)
+        """, (
+            STATUS_QUEUED,
+            STATUS_QUEUED, *FINISHED_STATUSES,
+            STATUS_QUEUED,
+            STATUS_QUEUED, *FINISHED_STATUSES,
+            tenant_id, *FINISHED_STATUSES
+        ))
+        row = cursor.fetchone()
+        cursor.close()
+        return {
+            "queued_jobs": int(row['queued'] or 0),
+            "running_jobs": int(row['running'] or 0),
+            "oldest_queued_seconds": int(row['oldest_queued_seconds']) if row['oldest_queued_seconds'] is not None else None,
+            "scheduler_wait_seconds": round(float(row['scheduler_wait_seconds'] or 0), 3)
+        }
+    finally:
+        connection.close()
+
+def get_job_events(job_id: str, after_id: int = 0, limit: int = 500) -> List[dict]:
+    """Events of a job newer than after_id, oldest first."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT id, event_type, data, created_at FROM job_events
+            WHERE job_id = %s AND id > %s
+            ORDER BY id
+            LIMIT %s
+        """, (job_id, after_id, limit))
+        events = cursor.fetchall()
+        cursor.close()
+        for event in events:
+            if isinstance(event['data'], (str, bytes)):
+                event['data'] = json.loads(event['data'])
+        return events
+    finally:
+        connection.close()
+
+def get_last_event_id(job_id: str) -> int:
+    """Id of a job's newest event, or 0 if it has none."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM job_events WHERE job_id = %s", (job_id,))
+        (last_id,) = cursor.fetchone()
+        cursor.close()
+        return int(last_id)
+    finally:
+        connection.close()
@@ -18,6 +18,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Version of the tables created by init_db; bump it whenever their DDL changes
+SCHEMA_VERSION = 1
+
 def get_db_connection(use_database=True):
     try:
         # Check if using hosted or local database
@@ -102,11 +105,28 @@ def create_database():
             logger.info("Database connection closed")
 
 def init_db():
-    """Initialize database with required tables."""
+    """Initialize database with required tables.
+
+    Skipped when the database already records SCHEMA_VERSION, so a
+    restart doesn't run the DDL again.
+    """
     connection = get_db_connection()
     cursor = connection.cursor()
     
     try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                id TINYINT PRIMARY KEY,
+                version INT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("SELECT version FROM schema_version WHERE id = 1")
+        row = cursor.fetchone()
+        if row and row[0] >= SCHEMA_VERSION:
+            logger.info(f"Database schema is at version {row[0]}; nothing to initialize")
+            return
+
         # Create users table if not exists
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS users (
@@ -152,8 +172,87 @@ def init_db():
             )
         """)
         
+        # Create crawled_pages table for incremental recrawls
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS crawled_pages (
+                collection_name VARCHAR(255) NOT NULL,
+                url_hash CHAR(64) NOT NULL,
+                url TEXT NOT NULL,
+                etag VARCHAR(512),
+                last_modified VARCHAR(64),
+                content_hash CHAR(64),
+                crawled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                
+                PRIMARY KEY (collection_name, url_hash),
+                INDEX idx_crawled_at (crawled_at)
+            )
+        """)
+        
+        # Create uploaded_files table: content and chunk hashes of uploaded files, to skip or diff re-uploads
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS uploaded_files (
+                collection_name VARCHAR(255) NOT NULL,
+                file_hash CHAR(64) NOT NULL,
+                file_name TEXT NOT NULL,
+                content_hash CHAR(64) NOT NULL,
+                size BIGINT NOT NULL,
+                chunk_hashes JSON,
+                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                
+                PRIMARY KEY (collection_name, file_hash)
+            )
+        """)
+        
+        # Create ingest_jobs table: durable queue for scraping / ingestion workers
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_jobs (
+                id VARCHAR(64) PRIMARY KEY,
+                job_type VARCHAR(32) NOT NULL,
+                collection_name VARCHAR(255) NOT NULL,
+                tenant_id VARCHAR(255),
+                url TEXT,
+                params JSON,
+                status VARCHAR(32) NOT NULL DEFAULT 'queued',
+                progress JSON,
+                checkpoint JSON,
+                result JSON,
+                error TEXT,
+                attempts INT NOT NULL DEFAULT 0,
+                worker_id VARCHAR(128),
+                heartbeat_at TIMESTAMP NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP NULL,
+                finished_at TIMESTAMP NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                
+                INDEX idx_status_created (status, created_at),
+                INDEX idx_collection_name (collection_name),
+                INDEX idx_tenant_status (tenant_id, status),
+                INDEX idx_finished_at (finished_at)
+            )
+        """)
+        # Queues created before jobs were scheduled per tenant
+        add_column_if_missing(cursor, "ingest_jobs", "tenant_id", "VARCHAR(255) AFTER collection_name")
+        
+        # Create job_events table: stage transitions and progress snapshots streamed to dashboards
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS job_events (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                job_id VARCHAR(64) NOT NULL,
+                event_type VARCHAR(32) NOT NULL,
+                data JSON,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                
+                INDEX idx_job_id (job_id, id)
+            )
+        """)
+        
+        cursor.execute(
+            "INSERT INTO schema_version (id, version) VALUES (1, %s) ON DUPLICATE KEY UPDATE version = VALUES(version)",
+            (SCHEMA_VERSION,)
+        )
         connection.commit()
-        logger.info("Database tables initialized successfully")
+        logger.info(f"Database tables initialized successfully (schema version {SCHEMA_VERSION})")
     except Error as e:
         logger.error(f"Error initializing database tables: {e}")
         raise e
@@ -162,6 +261,16 @@ def init_db():
         connection.close()
         logger.info("Database connection closed")
 
+def add_column_if_missing(cursor, table: str, column: str, definition: str) -> None:
+    """Add a column to an existing table; CREATE TABLE IF NOT EXISTS leaves old tables untouched."""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    if cursor.fetchone() is None:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        logger.info(f"Added column {table}.{column}")
+
 def get_db():
     """Get database connection"""
     connection = get_db_connection()
@@ -1,14 +1,23 @@
 from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct, OptimizersConfigDiff, CollectionStatus
+from qdrant_client.models import (
+    VectorParams, Distance, PointStruct, OptimizersConfigDiff, CollectionStatus,
+    SparseVectorParams, SparseIndexParams, SparseVector, NamedVector, NamedSparseVector, SearchRequest,
+    Filter, FieldCondition, MatchAny, FilterSelector, PayloadSchemaType, PointIdsList
+)
 from typing import List, Optional, Dict, Any
 import logging
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+import threading
 import time
 from tenacity import retry, stop_after_attempt, wait_exponential
-import google.generativeai as genai
 import json
+import re
+import uuid
+
+from app.services.sparse import get_sparse_embeddings, get_question_sparse_embedding
+from app.db.text_store import TEXT_STORE_ENABLED, delete_source_texts, delete_texts, get_texts, put_texts
 
 load_dotenv()
 
@@ -16,9 +25,6 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
 def get_qdrant_client() -> QdrantClient:
     """Create and return a Qdrant client with proper configuration for local or hosted setup."""
     try:
@@ -67,32 +73,66 @@ def get_qdrant_client() -> QdrantClient:
         logger.error(f"Failed to initialize Qdrant client: {e}")
         raise
 
-# Initialize Qdrant client
-try:
-    qdrant = get_qdrant_client()
-except Exception as e:
-    logger.error(f"Failed to connect to Qdrant server: {e}")
-    raise
+_qdrant: Optional[QdrantClient] = None
+_client_lock = threading.Lock()
+
+def get_qdrant() -> QdrantClient:
+    """Shared Qdrant client, connected on first use rather than at import."""
+    global _qdrant
+    if _qdrant is None:
+        with _client_lock:
+            if _qdrant is None:
+                _qdrant = get_qdrant_client()
+    return _qdrant
 
 VECTOR_SIZE = 384
 
+# Named vectors used by hybrid (dense + BM25 sparse) collections
+DENSE_VECTOR_NAME = "dense"
+SPARSE_VECTOR_NAME = "sparse"
+
+# Reciprocal rank fusion constant; larger values flatten the contribution of top ranks
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Collections created before hybrid search have a single unnamed dense vector
+_hybrid_collections: Dict[str, bool] = {}
+
+# Payload field holding the page URL / file a chunk came from
+SOURCE_FIELD = "metadata.source"
+
+# Neighbouring chunks on each side returned with every hit (0 returns hits as indexed)
+RETRIEVAL_WINDOW = int(os.getenv("RETRIEVAL_WINDOW", "1"))
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+def point_id(source: str, position: int) -> str:
+    """Deterministic point id for the chunk at a position within a source."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}#{position}"))
+
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
 def create_collection_if_not_exists(collection_name: str) -> None:
     """Create a Qdrant collection if it doesn't exist."""
     try:
         # Check if collection exists
-        collections = qdrant.get_collections()
+        collections = get_qdrant().get_collections()
         existing_names = [col.name for col in collections.collections]
         
         if collection_name not in existing_names:
             # Create collection with proper configuration
-            qdrant.create_collection(
+            get_qdrant().create_collection(
                 collection_name=collection_name,
-                vectors_config=VectorParams(
-                    size=VECTOR_SIZE,
-                    distance=Distance.COSINE,
-                    on_disk=True  # Store vectors on disk to save memory
-                ),
+                vectors_config={
+                    DENSE_VECTOR_NAME: VectorParams(
+                        size=VECTOR_SIZE,
+                        distance=Distance.COSINE,
+                        on_disk=True  # Store vectors on disk to save memory
+                    )
+                },
+                sparse_vectors_config={
+                    SPARSE_VECTOR_NAME: SparseVectorParams(
+                        index=SparseIndexParams(on_disk=True)
+                    )
+                },
                 optimizers_config=OptimizersConfigDiff(
                     default_segment_number=2,
                     max_optimization_threads=4,
@@ -103,6 +143,12 @@ def create_collection_if_not_exists(collection_name: str) -> None:
                 write_consistency_factor=1,  # Single node setup
                 init_from=None  # Don't initialize from another collection
             )
+            # Index the source so a page's or file's chunks can be replaced efficiently
+            get_qdrant().create_payload_index(
+                collection_name=collection_name,
+                field_name=SOURCE_FIELD,
+                field_schema=PayloadSchemaType.KEYWORD
+            )
             logger.info(f"Created collection: {collection_name}")
         else:
             logger.info(f"Collection {collection_name} already exists")
@@ -110,7 +156,7 @@ def create_collection_if_not_exists(collection_name: str) -> None:
         # Verify collection was created/accessed
         try:
             # Use get_collection instead of get_collection_info
-            collection_info = qdrant.get_collection(collection_name)
+            collection_info = get_qdrant().get_collection(collection_name)
             if not collection_info:
                 raise Exception(f"Failed to verify collection {collection_name}")
             
@@ -129,8 +175,21 @@ def create_collection_if_not_exists(collection_name: str) -> None:
         raise
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def ingest_to_qdrant(collection_name: str, texts: List[str], embeddings: List[List[float]]) -> None:
-    """Ingest text chunks and embeddings into Qdrant."""
+def ingest_to_qdrant(
+    collection_name: str,
+    texts: List[str],
+    embeddings: List[List[float]],
+    sources: Optional[List[str]] = None,
+    positions: Optional[List[int]] = None
+) -> None:
+    """Ingest text chunks and embeddings into Qdrant.
+
+    With sources, each chunk is stored under a deterministic id derived from
+    its source and position (defaulting to its index), so re-ingesting a
+    source overwrites its points instead of clobbering other data. With
+    TEXT_STORE_ENABLED, chunk text goes to the local compressed text store
+    and the point payload keeps only metadata.
+    """
     try:
         # Validate inputs
         if not texts or not embeddings:
@@ -139,6 +198,12 @@ def ingest_to_qdrant(collection_name: str, texts: List[str], embeddings: List[Li
         if len(texts) != len(embeddings):
             raise ValueError(f"Mismatched lengths: {len(texts)} texts vs {len(embeddings)} embeddings")
             
+        if sources is not None and len(sources) != len(texts):
+            raise ValueError(f"Mismatched lengths: {len(texts)} texts vs {len(sources)} sources")
+        
+        if positions is None:
+            positions = list(range(len(texts)))
+            
         # Validate embedding dimensions
         for i, embedding in enumerate(embeddings):
             if len(embedding) != VECTOR_SIZE:
@@ -146,29 +211,50 @@ def ingest_to_qdrant(collection_name: str, texts: List[str], embeddings: List[Li
         
         # Ensure collection exists
         create_collection_if_not_exists(collection_name)
+        hybrid = is_hybrid_collection(collection_name)
+        sparse_embeddings = get_sparse_embeddings(texts) if hybrid else [None] * len(texts)
         
         # Prepare points with metadata
         points = []
-        for i, (text, embedding) in enumerate(zip(texts, embeddings)):
+        stored_texts = []
+        for i, (text, embedding, sparse) in enumerate(zip(texts, embeddings, sparse_embeddings)):
             if not text.strip():
                 continue
+            
+            if hybrid:
+                vector = {
+                    DENSE_VECTOR_NAME: embedding,
+                    SPARSE_VECTOR_NAME: SparseVector(indices=sparse[0], values=sparse[1])
+                }
+            else:
+                vector = embedding
+                
+            metadata = {
+                "chunk_index": positions[i],
+                "text_length": len(text),
+                "created_at": datetime.now().isoformat()
+            }
+            if sources is not None:
+                metadata["source"] = sources[i]
+                
+            payload = {"metadata": metadata}
+            if not TEXT_STORE_ENABLED:
+                payload["text"] = text
                 
             point = PointStruct(
-                id=i,
-                vector=embedding,
-                payload={
-                    "text": text,
-                    "metadata": {
-                        "chunk_index": i,
-                        "text_length": len(text),
-                        "created_at": datetime.now().isoformat()
-                    }
-                }
+                id=point_id(sources[i], positions[i]) if sources is not None else i,
+                vector=vector,
+                payload=payload
             )
             points.append(point)
+            stored_texts.append((point.id, metadata.get("source"), text))
         
         if not points:
             raise ValueError("No valid points to insert")
+        
+        # Text goes to the local store before the points become searchable
+        if TEXT_STORE_ENABLED:
+            put_texts(collection_name, stored_texts)
             
         # Batch process points
         batch_size = 100
@@ -177,7 +263,7 @@ def ingest_to_qdrant(collection_name: str, texts: List[str], embeddings: List[Li
         for i in range(0, len(points), batch_size):
             batch = points[i:i + batch_size]
             try:
-                qdrant.upsert(
+                get_qdrant().upsert(
                     collection_name=collection_name,
                     points=batch,
                     wait=True,  # Wait for operation to complete
@@ -199,61 +285,267 @@ def ingest_to_qdrant(collection_name: str, texts: List[str], embeddings: List[Li
         logger.error(f"Failed to ingest to Qdrant: {e}")
         raise
 
+def delete_source_points(collection_name: str, sources: List[str]) -> None:
+    """Delete every point whose payload source is one of the given sources."""
+    if not sources:
+        return
+    try:
+        existing_names = [col.name for col in get_qdrant().get_collections().collections]
+        if collection_name not in existing_names:
+            return
+        get_qdrant().delete(
+            collection_name=collection_name,
+            points_selector=FilterSelector(
+                filter=Filter(must=[FieldCondition(key=SOURCE_FIELD, match=MatchAny(any=sources))])
+            ),
+            wait=True
+        )
+        if TEXT_STORE_ENABLED:
+            delete_source_texts(collection_name, sources)
+        logger.info(f"Deleted points of {len(sources)} source(s) from collection {collection_name}")
+    except Exception as e:
+        logger.error(f"Failed to delete source points from Qdrant: {e}")
+        raise
+
+def delete_source_positions(collection_name: str, source: str, positions: List[int]) -> None:
+    """Delete the points at the given chunk positions of one source."""
+    if not positions:
+        return
+    ids = [point_id(source, position) for position in positions]
+    get_qdrant().delete(collection_name=collection_name, points_selector=PointIdsList(points=ids), wait=True)
+    if TEXT_STORE_ENABLED:
+        delete_texts(collection_name, ids)
+
+def get_source_vectors(collection_name: str, source: str, positions: List[int]) -> Dict[int, List[float]]:
+    """Dense vectors of the points at the given chunk positions of one source, by position.
+
+    Positions without a point are left out, as is everything when the
+    collection does not exist.
+    """
+    if not positions:
+        return {}
+    existing_names = [col.name for col in get_qdrant().get_collections().collections]
+    if collection_name not in existing_names:
+        return {}
+    hybrid = is_hybrid_collection(collection_name)
+    by_id = {point_id(source, position): position for position in positions}
+    points = get_qdrant().retrieve(
+        collection_name=collection_name,
+        ids=list(by_id),
+        with_payload=False,
+        with_vectors=[DENSE_VECTOR_NAME] if hybrid else True
+    )
+    return {
+        by_id[str(point.id)]: point.vector[DENSE_VECTOR_NAME] if hybrid else point.vector
+        for point in points
+        if point.vector
+    }
+
+def is_hybrid_collection(collection_name: str) -> bool:
+    """Check whether a collection stores named dense + sparse vectors."""
+    if collection_name not in _hybrid_collections:
+        params = get_qdrant().get_collection(collection_name).config.params
+        _hybrid_collections[collection_name] = bool(
+            isinstance(params.vectors, dict)
+            and DENSE_VECTOR_NAME in params.vectors
+            and params.sparse_vectors
+            and SPARSE_VECTOR_NAME in params.sparse_vectors
+        )
+    return _hybrid_collections[collection_name]
+
+def fetch_texts(collection_name: str, ids: List[Any]) -> Dict[str, str]:
+    """Chunk text of many points by id, from the text store and/or Qdrant payloads."""
+    ids = [str(pid) for pid in ids]
+    texts = get_texts(collection_name, ids) if TEXT_STORE_ENABLED else {}
+    # Points ingested before the text store was enabled still carry their text in Qdrant
+    missing = [pid for pid in ids if pid not in texts]
+    if missing:
+        for point in get_qdrant().retrieve(collection_name=collection_name, ids=missing, with_payload=["text"]):
+            if point.payload and point.payload.get("text"):
+                texts[str(point.id)] = point.payload["text"]
+    return texts
+
+def attach_texts(collection_name: str, hits: List[dict]) -> List[dict]:
+    """Fill in payload text for hits whose points keep their text in the text store."""
+    if not TEXT_STORE_ENABLED:
+        return hits
+    missing = [hit["id"] for hit in hits if "text" not in hit["payload"]]
+    if missing:
+        texts = get_texts(collection_name, missing)
+        for hit in hits:
+            hit["payload"].setdefault("text", texts.get(str(hit["id"]), ""))
+    return hits
+
 def query_qdrant(collection_name: str, query_vector: List[float], limit: int = 3) -> List[dict]:
     """Query top relevant chunks from Qdrant using cosine similarity."""
     try:
-        hits = qdrant.search(
+        vector = NamedVector(name=DENSE_VECTOR_NAME, vector=query_vector) if is_hybrid_collection(collection_name) else query_vector
+        hits = get_qdrant().search(
             collection_name=collection_name,
-            query_vector=query_vector,
+            query_vector=vector,
             limit=limit,
             with_payload=True
         )
-        return [
+        return attach_texts(collection_name, [
             {
                 "id": hit.id,
                 "score": hit.score,
                 "payload": hit.payload
             }
             for hit in hits
-        ]
+        ])
     except Exception as e:
         logging.error(f"Failed to query Qdrant: {e}")
         return []
-    
-def enhanced_query_qdrant(collection_name: str, query_vector: List[float], keywords: List[str], limit: int = 5) -> List[dict]:
-    """Enhanced query with keyword filtering and multiple search strategies."""
+
+def reciprocal_rank_fusion(result_lists: List[List[Any]], limit: int, k: int = RRF_K) -> List[dict]:
+    """Fuse ranked lists of scored points with RRF: score = sum(1 / (k + rank))."""
+    fused: Dict[Any, dict] = {}
+    for hits in result_lists:
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.get(hit.id)
+            if entry is None:
+                entry = fused[hit.id] = {"id": hit.id, "score": 0.0, "payload": hit.payload}
+                vector = hit.vector.get(DENSE_VECTOR_NAME) if isinstance(hit.vector, dict) else hit.vector
+                if vector is not None:
+                    entry["vector"] = vector
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda x: x["score"], reverse=True)[:limit]
+
+def multi_query_qdrant(
+    collection_name: str,
+    query_vectors: List[List[float]],
+    query_texts: List[str],
+    limit: int = 5,
+    with_vectors: bool = False
+) -> List[dict]:
+    """Run several queries in one batched call and fuse all rankings with RRF.
+
+    Each query contributes a dense search and, on hybrid collections, a BM25
+    sparse search. Points found by more than one query are deduplicated by id.
+    Collections created without sparse vectors are searched dense-only.
+    With with_vectors, each hit also carries its dense vector under 'vector'.
+    """
     try:
-        # Primary vector search
-        hits = qdrant.search(
-            collection_name=collection_name,
-            query_vector=query_vector,
-            limit=limit * 2,  # Get more results initially
-            with_payload=True
-        )
+        if not query_vectors:
+            return []
+        if len(query_vectors) != len(query_texts):
+            raise ValueError(f"Mismatched lengths: {len(query_vectors)} vectors vs {len(query_texts)} texts")
         
-        results = []
-        for hit in hits:
-            score = hit.score
-            payload = hit.payload
-            
-            # Boost score if keywords found in text
-            if payload and payload.get('text'):
-                text_lower = payload['text'].lower()
-                keyword_matches = sum(1 for keyword in keywords if keyword.lower() in text_lower)
-                if keyword_matches > 0:
-                    score += (keyword_matches * 0.1)  # Boost score
-            
-            results.append({
-                "id": hit.id,
-                "score": score,
-                "payload": payload,
-                "keyword_matches": keyword_matches if 'keyword_matches' in locals() else 0
-            })
+        hybrid = is_hybrid_collection(collection_name)
+        prefetch = limit * 3
+        with_vector = ([DENSE_VECTOR_NAME] if hybrid else True) if with_vectors else False
+        requests = []
+        for query_vector, query_text in zip(query_vectors, query_texts):
+            requests.append(
+                SearchRequest(
+                    vector=NamedVector(name=DENSE_VECTOR_NAME, vector=query_vector) if hybrid else query_vector,
+                    limit=prefetch,
+                    with_payload=True,
+                    with_vector=with_vector
+                )
+            )
+            if not hybrid:
+                continue
+            indices, values = get_question_sparse_embedding(query_text)
+            if indices:
+                requests.append(
+                    SearchRequest(
+                        vector=NamedSparseVector(
+                            name=SPARSE_VECTOR_NAME,
+                            vector=SparseVector(indices=indices, values=values)
+                        ),
+                        limit=prefetch,
+                        with_payload=True,
+                        with_vector=with_vector
+                    )
+                )
         
-        # Sort by enhanced score and return top results
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results[:limit]
+        result_lists = get_qdrant().search_batch(collection_name=collection_name, requests=requests)
+        # Only the fused top hits need their text, fetched in one batched lookup
+        return attach_texts(collection_name, reciprocal_rank_fusion(result_lists, limit=limit))
         
     except Exception as e:
-        logging.error(f"Failed to query Qdrant: {e}")
-        return []
\ No newline at end of file
+        logging.error(f"Failed to run multi-query search on Qdrant: {e}")
+        return []
+
+def _merge_window_texts(texts: List[str]) -> str:
+    """Join consecutive chunks, dropping the sentence overlap each repeats from the previous one."""
+    merged = texts[0]
+    for text in texts[1:]:
+        sentences = SENTENCE_BOUNDARY.split(text)
+        overlap = 0
+        for k in range(1, len(sentences)):
+            if merged.endswith(" ".join(sentences[:k])):
+                overlap = k
+        merged = f"{merged} {' '.join(sentences[overlap:])}" if overlap < len(sentences) else merged
+    return merged
+
+def expand_to_windows(collection_name: str, hits: List[dict], window: int = RETRIEVAL_WINDOW) -> List[dict]:
+    """Replace each hit's text with the window of chunks around it (small-to-big retrieval).
+
+    Neighbours are the chunks of the same source at positions within
+    window of the hit, fetched together in one batched lookup by their
+    deterministic ids. Hits from one source whose windows overlap
+    are merged into a single hit that keeps the best score, id and
+    vector. The covered positions are recorded in metadata['window'].
+    Hits without source linkage (legacy points) are returned unchanged.
+    """
+    if window <= 0 or not hits:
+        return hits
+    try:
+        spans: Dict[str, List[list]] = {}
+        order: List[Any] = []
+        for hit in hits:
+            metadata = hit["payload"].get("metadata", {})
+            source, position = metadata.get("source"), metadata.get("chunk_index")
+            if source is None or position is None:
+                order.append(hit)
+                continue
+            start, end = max(0, position - window), position + window
+            for span in spans.setdefault(source, []):
+                if start <= span[1] + 1 and end >= span[0] - 1:
+                    span[0], span[1] = min(span[0], start), max(span[1], end)
+                    break
+            else:
+                span = [start, end, hit]
+                spans[source].append(span)
+                order.append(span)
+
+        ids = [
+            point_id(source, position)
+            for source, source_spans in spans.items()
+            for start, end, _ in source_spans
+            for position in range(start, end + 1)
+        ]
+        texts = fetch_texts(collection_name, ids)
+
+        expanded = []
+        for item in order:
+            if isinstance(item, dict):
+                expanded.append(item)
+                continue
+            start, end, hit = item
+            source = hit["payload"]["metadata"]["source"]
+            found = [(p, texts[point_id(source, p)]) for p in range(start, end + 1) if texts.get(point_id(source, p))]
+            if not found:
+                expanded.append(hit)
+                continue
+            window_texts = [text for _, text in found]
+            metadata = {**hit["payload"]["metadata"], "window": [found[0][0], found[-1][0]]}
+            expanded.append({
+                **hit,
+                "payload": {**hit["payload"], "text": _merge_window_texts(window_texts), "metadata": metadata}
+            })
+        return expanded
+
+    except Exception as e:
+        logging.error(f"Failed to expand hits to their chunk windows: {e}")
+        return hits
+
+def hybrid_query_qdrant(collection_name: str, query_vector: List[float], query_text: str, limit: int = 5) -> List[dict]:
+    """Query with dense and BM25 sparse vectors in one batched call and fuse the rankings with RRF.
+
+    Falls back to dense-only search for collections created without sparse vectors.
+    """
+    return multi_query_qdrant(collection_name, [query_vector], [query_text], limit=limit)
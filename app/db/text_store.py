@@ -0,0 +1,125 @@
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+try:
+    import zstandard
+except ImportError:  # zlib is always available; zstd is faster and compresses better
+    zstandard = None
+
+load_dotenv()
+
+# Keep chunk text in a local compressed store instead of Qdrant payloads
+TEXT_STORE_ENABLED = os.getenv("TEXT_STORE_ENABLED", "false").lower() == "true"
+# SQLite file holding the compressed chunk text
+TEXT_STORE_PATH = os.getenv("TEXT_STORE_PATH", "data/chunk_text.db")
+# zstd level (zlib falls back to level 6)
+TEXT_STORE_ZSTD_LEVEL = int(os.getenv("TEXT_STORE_ZSTD_LEVEL", "6"))
+
+# First byte of every stored blob names its codec, so stores survive zstandard being installed or removed
+CODEC_ZSTD = b"Z"
+CODEC_ZLIB = b"L"
+
+_local = threading.local()
+
+def _compress(text: str) -> bytes:
+    data = text.encode("utf-8")
+    if zstandard is not None:
+        if not hasattr(_local, "compressor"):
+            _local.compressor = zstandard.ZstdCompressor(level=TEXT_STORE_ZSTD_LEVEL)
+        return CODEC_ZSTD + _local.compressor.compress(data)
+    return CODEC_ZLIB + zlib.compress(data, 6)
+
+def _decompress(blob: bytes) -> str:
+    codec, data = blob[:1], blob[1:]
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Chunk text was stored with zstd; install zstandard to read it")
+        if not hasattr(_local, "decompressor"):
+            _local.decompressor = zstandard.ZstdDecompressor()
+        return _local.decompressor.decompress(data).decode("utf-8")
+    return zlib.decompress(data).decode("utf-8")
+
+def _get_connection() -> sqlite3.Connection:
+    """One connection per thread; ingestion runs in worker threads, queries in the event loop."""
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        directory = os.path.dirname(TEXT_STORE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(TEXT_STORE_PATH, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_text (
+                collection_name TEXT NOT NULL,
+                point_id TEXT NOT NULL,
+                source TEXT,
+                body BLOB NOT NULL,
+                PRIMARY KEY (collection_name, point_id)
+            ) WITHOUT ROWID
+        """)
+        connection.execute("""
+            CREATE INDEX IF NOT EXISTS idx_chunk_text_source ON chunk_text (collection_name, source)
+        """)
+        connection.commit()
+        _local.connection = connection
+    return connection
+
+def put_texts(collection_name: str, rows: Iterable[Tuple[str, Optional[str], str]]) -> None:
+    """Store (point id, source, text) rows, replacing existing text for the same ids."""
+    connection = _get_connection()
+    with connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO chunk_text (collection_name, point_id, source, body) VALUES (?, ?, ?, ?)",
+            [(collection_name, str(pid), source, _compress(text)) for pid, source, text in rows]
+        )
+
+def get_texts(collection_name: str, point_ids: List[str]) -> Dict[str, str]:
+    """Fetch the text of many points in one lookup. Unknown ids are left out."""
+    if not point_ids:
+        return {}
+    connection = _get_connection()
+    ids = list(dict.fromkeys(str(pid) for pid in point_ids))
+    texts: Dict[str, str] = {}
+    # Stay below SQLite's bound-parameter limit
+    for i in range(0, len(ids), 500):
+        batch = ids[i:i + 500]
+        placeholders = ",".join("?" * len(batch))
+        rows = connection.execute(
+            f"SELECT point_id, body FROM chunk_text WHERE collection_name = ? AND point_id IN ({placeholders})",
+            [collection_name, *batch]
+        )
+        for pid, body in rows:
+            try:
+                texts[pid] = _decompress(body)
+            except Exception as e:
+                logging.error(f"Failed to decompress text of point {pid}: {e}")
+    return texts
+
+def delete_source_texts(collection_name: str, sources: List[str]) -> None:
+    """Remove the stored text of every chunk of the given sources."""
+    if not sources:
+        return
+    connection = _get_connection()
+    with connection:
+        connection.executemany(
+            "DELETE FROM chunk_text WHERE collection_name = ? AND source = ?",
+            [(collection_name, source) for source in sources]
+        )
+
+def delete_texts(collection_name: str, point_ids: List[str]) -> None:
+    """Remove the stored text of the given points."""
+    if not point_ids:
+        return
+    connection = _get_connection()
+    with connection:
+        connection.executemany(
+            "DELETE FROM chunk_text WHERE collection_name = ? AND point_id = ?",
+            [(collection_name, str(pid)) for pid in point_ids]
+        )
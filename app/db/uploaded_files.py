@@ -0,0 +1,64 @@
+import hashlib
+import json
+from typing import List, Optional
+
+from app.db.mysql import get_db_connection
+
+
+def _file_hash(file_name: str) -> str:
+    return hashlib.sha256(file_name.encode("utf-8")).hexdigest()
+
+def get_uploaded_file(collection_name: str, file_name: str) -> Optional[dict]:
+    """Get the content hash, size and per-chunk hashes recorded for a file uploaded to a collection."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT file_name, content_hash, size, chunk_hashes, uploaded_at FROM uploaded_files
+            WHERE collection_name = %s AND file_hash = %s
+        """, (collection_name, _file_hash(file_name)))
+        row = cursor.fetchone()
+        cursor.close()
+        if row and isinstance(row['chunk_hashes'], (str, bytes)):
+            row['chunk_hashes'] = json.loads(row['chunk_hashes'])
+        return row
+    finally:
+        connection.close()
+
+def save_uploaded_file(
+    collection_name: str,
+    file_name: str,
+    content_hash: str,
+    size: int,
+    chunk_hashes: List[str]
+) -> None:
+    """Record what was ingested for a file, replacing the previous upload's record."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            INSERT INTO uploaded_files (collection_name, file_hash, file_name, content_hash, size, chunk_hashes)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                content_hash = VALUES(content_hash),
+                size = VALUES(size),
+                chunk_hashes = VALUES(chunk_hashes),
+                uploaded_at = NOW()
+        """, (collection_name, _file_hash(file_name), file_name, content_hash, size, json.dumps(chunk_hashes)))
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+def delete_uploaded_file(collection_name: str, file_name: str) -> None:
+    """Forget a file's record, e.g. while its points are being rewritten."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            DELETE FROM uploaded_files WHERE collection_name = %s AND file_hash = %s
+        """, (collection_name, _file_hash(file_name)))
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
@@ -1,7 +1,18 @@
-from fastapi import FastAPI
+import time
+
+# Taken before the other imports so the startup breakdown includes import time
+_import_started = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.api.routes import router
-from app.db.mysql import init_db
+from app.services.startup import initialize, readiness
+from app.utils.uploads import (
+    BULK_UPLOAD_MAX_BYTES, BULK_UPLOAD_MAX_MB, UPLOAD_FORM_OVERHEAD_BYTES, UPLOAD_MAX_BYTES, UPLOAD_MAX_MB
+)
 import logging
 import sys
 import os
@@ -20,7 +31,36 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="WebChat Widget API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize dependencies in the background so the server starts accepting requests at once.
+
+    /healthz answers immediately; /readyz turns 200 once initialization is done.
+    """
+    logger.info(f"Application imported in {time.perf_counter() - _import_started:.2f}s")
+    startup = asyncio.create_task(initialize())
+    try:
+        yield
+    finally:
+        startup.cancel()
+        await asyncio.gather(startup, return_exceptions=True)
+
+app = FastAPI(title="WebChat Widget API", lifespan=lifespan)
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Refuse oversized uploads from their Content-Length, before the body is spooled.
+
+    Bodies sent without a Content-Length are still capped while the upload is read.
+    Registered before CORSMiddleware, which wraps it, so the 413 still carries CORS headers.
+    """
+    content_length = request.headers.get("content-length")
+    max_mb, max_bytes = UPLOAD_MAX_MB, UPLOAD_MAX_BYTES
+    if request.url.path.endswith("/bulk-upload"):
+        max_mb, max_bytes = BULK_UPLOAD_MAX_MB, BULK_UPLOAD_MAX_BYTES
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + UPLOAD_FORM_OVERHEAD_BYTES:
+        return JSONResponse(status_code=413, content={"detail": f"Request exceeds the {max_mb:g} MB upload limit"})
+    return await call_next(request)
 
 # Add CORS middleware
 app.add_middleware(
@@ -34,17 +74,16 @@ app.add_middleware(
 # Include API routes
 app.include_router(router, prefix="/api")
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database on startup"""
-    try:
-        logger.info("Starting application initialization...")
-        logger.info("Initializing database and creating tables...")
-        init_db()
-        logger.info("Application startup completed successfully!")
-    except Exception as e:
-        logger.error(f"Application startup failed: {e}")
-        raise e
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once the database, Qdrant and the models are initialized, else 503."""
+    state = readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
 
 if __name__ == "__main__":
     import uvicorn
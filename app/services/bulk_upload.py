@@ -0,0 +1,163 @@
+import logging
+import os
+import tempfile
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.db.qdrant import delete_source_points, get_source_vectors
+from app.db.uploaded_files import get_uploaded_file, save_uploaded_file
+from app.services.chunking import chunk_stream
+from app.services.ingest import EMBED_BATCH_SIZE, ProgressCallback, chunk_hash, store_chunks
+from app.utils.process_files import ALLOWED_EXTENSIONS, iter_document_text
+from app.utils.uploads import UPLOAD_MAX_BYTES, SpooledUpload, copy_hashed
+
+# Bytes of a zip member held in memory before its copy spills to disk
+ZIP_MEMBER_SPOOL_BYTES = 8 * 1024 * 1024
+
+def file_extension(name: str) -> str:
+    return name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+
+def _iter_documents(files: List[dict]) -> Iterator[Tuple[str, Optional[SpooledUpload], Optional[str]]]:
+    """Yield (source name, upload, problem) for every staged file and every zip archive member.
+
+    Zip members are copied one at a time into a spooled temporary file, so
+    an archive is never extracted as a whole. The upload is only valid
+    until the next item is requested. problem is set instead of an upload
+    for members that cannot be ingested.
+    """
+    for entry in files:
+        if file_extension(entry['name']) != 'zip':
+            with open(entry['path'], 'rb') as f:
+                yield entry['name'], SpooledUpload(f, entry['size'], entry['sha256']), None
+            continue
+
+        try:
+            archive = zipfile.ZipFile(entry['path'])
+        except zipfile.BadZipFile as e:
+            yield entry['name'], None, f"invalid zip archive: {e}"
+            continue
+        with archive:
+            for info in archive.infolist():
+                name = info.filename
+                if info.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith('.'):
+                    continue
+                if file_extension(name) not in ALLOWED_EXTENSIONS:
+                    yield name, None, "unsupported file type"
+                    continue
+                with tempfile.SpooledTemporaryFile(max_size=ZIP_MEMBER_SPOOL_BYTES) as spool:
+                    try:
+                        with archive.open(info) as member:
+                            upload = copy_hashed(member, spool, UPLOAD_MAX_BYTES)
+                    except Exception as e:
+                        # Too large, encrypted, corrupt or an unsupported compression method
+                        yield name, None, str(e)
+                        continue
+                    yield name, upload, None
+
+def ingest_staged_files(
+    collection_name: str,
+    files: List[dict],
+    tenant: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """Ingest the staged files of a bulk upload as one job. Returns counters and a status per file.
+
+    files are {"name", "path", "size", "sha256"} entries; zip archives are
+    ingested member by member. Chunks of consecutive files are embedded
+    together in EMBED_BATCH_SIZE batches rather than file by file. A file
+    identical to its previous upload is skipped, and a changed file
+    replaces its previous chunks.
+    """
+    statuses: Dict[str, Dict[str, Any]] = {}
+    stats: Dict[str, Any] = {
+        "files_total": 0,
+        "files_ingested": 0,
+        "files_unchanged": 0,
+        "files_skipped": 0,
+        "files_failed": 0,
+        "chunks_created": 0,
+        "embeddings_done": 0,
+        "points_upserted": 0,
+        "scheduler_wait_seconds": 0.0
+    }
+    chunks: List[str] = []
+    sources: List[str] = []
+    positions: List[int] = []
+    # (source, sha256, size, chunk hashes) of the files whose chunks are waiting to be embedded
+    pending_files: List[Tuple[str, str, int, List[str]]] = []
+
+    def report(status: str, **counters) -> None:
+        if progress:
+            progress(status, **{**stats, **counters}, files=dict(statuses))
+
+    def flush() -> None:
+        if not pending_files:
+            return
+
+        def batch_progress(status: str, **counters) -> None:
+            report(status, **{key: stats[key] + value for key, value in counters.items()})
+
+        delete_source_points(collection_name, [source for source, _, _, _ in pending_files])
+        counters = store_chunks(
+            collection_name, chunks, sources, positions,
+            tenant=tenant, progress=batch_progress if progress else None
+        )
+        for key, value in counters.items():
+            stats[key] = round(stats[key] + value, 3)
+        for source, sha256, size, hashes in pending_files:
+            save_uploaded_file(collection_name, source, sha256, size, hashes)
+            statuses[source] = {"status": "ingested", "chunks": len(hashes)}
+        stats["files_ingested"] += len(pending_files)
+        chunks.clear()
+        sources.clear()
+        positions.clear()
+        pending_files.clear()
+        report("processing")
+
+    for source, upload, problem in _iter_documents(files):
+        stats["files_total"] += 1
+        if source in statuses:
+            # Same name twice (e.g. in two archives): keep the first and report the rest separately
+            problem = "duplicate file name in this upload"
+            source = f"{source} (#{stats['files_total']})"
+        if problem:
+            statuses[source] = {"status": "skipped", "reason": problem}
+            stats["files_skipped"] += 1
+            continue
+
+        previous = get_uploaded_file(collection_name, source)
+        if (
+            previous and previous['content_hash'] == upload.sha256
+            and get_source_vectors(collection_name, source, [0])
+        ):
+            statuses[source] = {"status": "unchanged"}
+            stats["files_unchanged"] += 1
+            continue
+
+        try:
+            document_chunks = [
+                chunk for chunk in chunk_stream(iter_document_text(upload.file, file_extension(source)))
+                if chunk.strip()
+            ]
+            if not document_chunks:
+                raise ValueError("no text content could be extracted")
+        except Exception as e:
+            logging.warning(f"Bulk upload into {collection_name}: failed to extract {source}: {e}")
+            statuses[source] = {"status": "failed", "error": getattr(e, 'detail', None) or str(e)}
+            stats["files_failed"] += 1
+            continue
+
+        statuses[source] = {"status": "queued", "chunks": len(document_chunks)}
+        chunks.extend(document_chunks)
+        sources.extend([source] * len(document_chunks))
+        positions.extend(range(len(document_chunks)))
+        pending_files.append((source, upload.sha256, upload.size, [chunk_hash(chunk) for chunk in document_chunks]))
+        report("processing")
+        if len(chunks) >= EMBED_BATCH_SIZE:
+            flush()
+
+    flush()
+    if not stats["files_ingested"] and not stats["files_unchanged"]:
+        raise ValueError(f"None of the {stats['files_total']} uploaded file(s) could be ingested: {statuses}")
+    logging.info(f"Bulk upload into {collection_name} finished: {stats}")
+    return {**stats, "files": statuses}
@@ -0,0 +1,113 @@
+import os
+import re
+from collections import deque
+from typing import Deque, Iterable, Iterator, List, Tuple
+
+from dotenv import load_dotenv
+
+from app.services.embeddings import count_tokens, embedding_max_tokens
+
+load_dotenv()
+
+# Target chunk length in embedding-model tokens; must stay below the model's window.
+# 192/32 are provisional until measured with benchmarks/bench_retrieval.py (see README)
+CHUNK_TARGET_TOKENS = int(os.getenv("CHUNK_TARGET_TOKENS", "192"))
+# Tokens of trailing sentences repeated at the start of the next chunk
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences, treating line breaks (extracted blocks) as boundaries."""
+    return [
+        sentence.strip()
+        for line in text.splitlines()
+        for sentence in SENTENCE_PATTERN.split(line)
+        if sentence.strip()
+    ]
+
+class TokenChunker:
+    """Packs sentences into chunks of about target_tokens embedding-model tokens.
+
+    Text is fed incrementally with add(); completed chunks are returned as
+    soon as they are full, and finish() returns the remainder. The current
+    chunk is a deque of (sentence, tokens) with a running total, so the
+    overlap carried into the next chunk is found by popping from the left:
+    every sentence is tokenized once, appended once and popped once.
+    Sentences longer than target_tokens are split on word boundaries.
+    """
+
+    def __init__(self, target_tokens: int = CHUNK_TARGET_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+        # Leave room for the [CLS]/[SEP] tokens the model adds
+        self.target_tokens = max(1, min(target_tokens, embedding_max_tokens() - 2))
+        self.overlap_tokens = max(0, min(overlap_tokens, self.target_tokens // 2))
+        self._window: Deque[Tuple[str, int]] = deque()
+        self._window_tokens = 0
+        self._fresh = 0  # sentences in the window not yet part of an emitted chunk
+
+    def _split_long(self, sentence: str, tokens: int) -> List[Tuple[str, int]]:
+        words = sentence.split()
+        step = max(1, len(words) * self.target_tokens // tokens)
+        pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        result: List[Tuple[str, int]] = []
+        for piece, piece_tokens in zip(pieces, count_tokens(pieces)):
+            if piece_tokens > self.target_tokens and step > 1:
+                result.extend(self._split_long(piece, piece_tokens))
+            else:
+                result.append((piece, piece_tokens))
+        return result
+
+    def _emit(self) -> str:
+        self._fresh = 0
+        return " ".join(sentence for sentence, _ in self._window)
+
+    def _push(self, sentence: str, tokens: int, chunks: List[str]) -> None:
+        if self._window and self._window_tokens + tokens > self.target_tokens:
+            chunks.append(self._emit())
+            while self._window and (
+                self._window_tokens > self.overlap_tokens
+                or self._window_tokens + tokens > self.target_tokens
+            ):
+                _, dropped = self._window.popleft()
+                self._window_tokens -= dropped
+        self._window.append((sentence, tokens))
+        self._window_tokens += tokens
+        self._fresh += 1
+
+    def add(self, text: str) -> List[str]:
+        """Feed more text; returns the chunks it completed."""
+        sentences = split_sentences(text)
+        chunks: List[str] = []
+        for sentence, tokens in zip(sentences, count_tokens(sentences)):
+            if tokens > self.target_tokens:
+                for piece, piece_tokens in self._split_long(sentence, tokens):
+                    self._push(piece, piece_tokens, chunks)
+            else:
+                self._push(sentence, tokens, chunks)
+        return chunks
+
+    def finish(self) -> List[str]:
+        """Return the last, partially filled chunk, if it holds any new text."""
+        chunks = [self._emit()] if self._fresh else []
+        self._window.clear()
+        self._window_tokens = 0
+        return chunks
+
+def chunk_stream(
+    texts: Iterable[str],
+    target_tokens: int = CHUNK_TARGET_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> Iterator[str]:
+    """Chunk a stream of text pieces (pages, blocks) of one document as they arrive."""
+    chunker = TokenChunker(target_tokens, overlap_tokens)
+    for text in texts:
+        yield from chunker.add(text)
+    yield from chunker.finish()
+
+def chunk_text(
+    text: str,
+    target_tokens: int = CHUNK_TARGET_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> List[str]:
+    """Split one document into token-sized, overlapping chunks."""
+    return list(chunk_stream([text], target_tokens, overlap_tokens))
@@ -0,0 +1,105 @@
+from typing import Any, Dict, List, Optional
+import logging
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.utils.common import estimate_tokens
+
+load_dotenv()
+
+# Hits whose cosine similarity to the question is below this are dropped
+CONTEXT_SCORE_THRESHOLD = float(os.getenv("CONTEXT_SCORE_THRESHOLD", "0.2"))
+# Reranked hits whose cross-encoder relevance (a probability, 0-1) is below this are dropped
+CONTEXT_RERANK_THRESHOLD = float(os.getenv("CONTEXT_RERANK_THRESHOLD", "0.05"))
+# MMR trade-off between relevance (1.0) and diversity (0.0)
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+# Maximum estimated prompt tokens spent on retrieved context
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _rerank_relevance(scores: np.ndarray) -> np.ndarray:
+    # Cross-encoder scores are logits; the sigmoid maps them to comparable 0-1 relevance
+    return 1.0 / (1.0 + np.exp(-scores))
+
+def select_context(
+    query_vector: List[float],
+    hits: List[Dict[str, Any]],
+    max_chunks: int = 5,
+    score_threshold: Optional[float] = None,
+    mmr_lambda: float = CONTEXT_MMR_LAMBDA,
+    token_budget: Optional[int] = CONTEXT_TOKEN_BUDGET
+) -> List[Dict[str, Any]]:
+    """Pick a relevant, non-redundant subset of hits that fits a token budget.
+
+    Hits need their dense vector under 'vector'. Relevance is the
+    cross-encoder score (squashed to 0-1) when every hit was reranked, so
+    the rerank order carries into the selection, and the cosine similarity
+    to the question otherwise. Hits below score_threshold (default
+    CONTEXT_RERANK_THRESHOLD or CONTEXT_SCORE_THRESHOLD respectively) and
+    exact duplicate texts are dropped. The rest are ordered by maximal
+    marginal relevance (MMR), with redundancy measured on the vectors, and
+    packed until max_chunks or token_budget is reached. Each selected hit
+    gets its relevance under 'similarity'. Hits without a vector are
+    returned unchanged, truncated to max_chunks.
+    """
+    if not hits:
+        return []
+    if any(hit.get("vector") is None for hit in hits):
+        return hits[:max_chunks]
+
+    try:
+        # Drop exact duplicate texts, keeping the best ranked copy
+        seen_texts = set()
+        candidates = []
+        for hit in hits:
+            text = ((hit.get("payload") or {}).get("text") or "").strip()
+            if not text or text in seen_texts:
+                continue
+            seen_texts.add(text)
+            candidates.append(hit)
+        if not candidates:
+            return []
+
+        vectors = _normalize(np.asarray([hit["vector"] for hit in candidates], dtype=np.float32))
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        if all(hit.get("rerank_score") is not None for hit in candidates):
+            relevance = _rerank_relevance(np.asarray([hit["rerank_score"] for hit in candidates], dtype=np.float32))
+            if score_threshold is None:
+                score_threshold = CONTEXT_RERANK_THRESHOLD
+        else:
+            relevance = vectors @ query
+            if score_threshold is None:
+                score_threshold = CONTEXT_SCORE_THRESHOLD
+
+        remaining = [i for i in range(len(candidates)) if relevance[i] >= score_threshold]
+        pairwise = vectors @ vectors.T
+        selected: List[int] = []
+        used_tokens = 0
+
+        while remaining and len(selected) < max_chunks:
+            if selected:
+                redundancy = pairwise[np.ix_(remaining, selected)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            mmr = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * redundancy
+            best = remaining.pop(int(np.argmax(mmr)))
+
+            tokens = estimate_tokens(candidates[best]["payload"]["text"])
+            if token_budget is not None and used_tokens + tokens > token_budget:
+                continue
+            used_tokens += tokens
+            selected.append(best)
+
+        logging.info(
+            f"Selected {len(selected)} of {len(hits)} context chunks (~{used_tokens} tokens)"
+        )
+        return [{**candidates[i], "similarity": float(relevance[i])} for i in selected]
+    except Exception as e:
+        logging.error(f"Failed to select context: {e}")
+        return hits[:max_chunks]
@@ -1,20 +1,47 @@
-from sentence_transformers import SentenceTransformer
 import logging
+import threading
 
-# Initialize the embedding model
-try:
-    embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-    logging.info("Embedding model loaded successfully")
-except Exception as e:
-    logging.error(f"Failed to load embedding model: {e}")
-    raise
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+_embedding_model = None
+_model_lock = threading.Lock()
+
+def get_embedding_model():
+    """Load the embedding model on first use; importing this module stays cheap."""
+    global _embedding_model
+    if _embedding_model is None:
+        with _model_lock:
+            if _embedding_model is None:
+                from sentence_transformers import SentenceTransformer
+                try:
+                    _embedding_model = SentenceTransformer(EMBEDDING_MODEL)
+                    logging.info("Embedding model loaded successfully")
+                except Exception as e:
+                    logging.error(f"Failed to load embedding model: {e}")
+                    raise
+    return _embedding_model
+
+def embedding_max_tokens() -> int:
+    """Longest input the model embeds, in tokens; anything beyond is truncated."""
+    return get_embedding_model().max_seq_length
+
+def warmup_embeddings() -> None:
+    """Load the model and run one encode, so the first real request doesn't pay for lazy setup."""
+    get_embedding_model().encode(["warmup"], show_progress_bar=False)
+
+def count_tokens(texts: list[str]) -> list[int]:
+    """Count embedding-model tokens in each text, excluding [CLS]/[SEP]."""
+    if not texts:
+        return []
+    encoded = get_embedding_model().tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"]
+    return [len(ids) for ids in encoded]
 
 def get_embeddings(texts: list[str]) -> list[list[float]]:
     """Generate embeddings for a list of texts."""
     try:
         if not texts:
             return []
-        embeddings = embedding_model.encode(texts, show_progress_bar=True)
+        embeddings = get_embedding_model().encode(texts, show_progress_bar=True)
         return embeddings.tolist()
     except Exception as e:
         logging.error(f"Failed to generate embeddings: {e}")
@@ -23,7 +50,7 @@ def get_embeddings(texts: list[str]) -> list[list[float]]:
 def get_question_embedding(question: str) -> list[float]:
     """Generate embedding for a single question."""
     try:
-        embedding = embedding_model.encode([question])
+        embedding = get_embedding_model().encode([question])
         return embedding[0].tolist()
     except Exception as e:
         logging.error(f"Failed to generate question embedding: {e}")
@@ -0,0 +1,127 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+from dotenv import load_dotenv
+from google.api_core import exceptions as api_exceptions
+from google.generativeai import client as genai_client
+from google.generativeai.types.generation_types import GenerateContentResponse
+
+from app.utils.common import estimate_tokens
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Seconds one Gemini call may take before it is abandoned
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+# 'grpc' multiplexes every call over one kept-alive HTTP/2 channel; 'rest' uses a pooled keep-alive HTTP session
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT", "grpc")
+
+_configured = False
+_models: Dict[str, genai.GenerativeModel] = {}
+_lock = threading.Lock()
+
+# Call name -> counters; latencies in seconds
+_stats: Dict[str, Dict[str, float]] = defaultdict(lambda: {
+    "calls": 0,
+    "errors": 0,
+    "timeouts": 0,
+    "seconds_total": 0.0,
+    "seconds_max": 0.0,
+    "prompt_tokens": 0,
+    "response_tokens": 0
+})
+_stats_lock = threading.Lock()
+
+def configure_gemini() -> None:
+    """Configure the Gemini API key and transport once per process."""
+    global _configured
+    if _configured:
+        return
+    with _lock:
+        if not _configured:
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY environment variable is required")
+            genai.configure(api_key=api_key, transport=GEMINI_TRANSPORT)
+            _configured = True
+
+def get_model(name: str) -> genai.GenerativeModel:
+    """The shared GenerativeModel for a model name, created on first use."""
+    model = _models.get(name)
+    if model is None:
+        configure_gemini()
+        with _lock:
+            model = _models.setdefault(name, genai.GenerativeModel(name))
+    return model
+
+def _record(call: str, seconds: float, prompt_tokens: int = 0, response_tokens: int = 0, error: Optional[str] = None) -> None:
+    with _stats_lock:
+        stats = _stats[call]
+        stats["calls"] += 1
+        stats["seconds_total"] += seconds
+        stats["seconds_max"] = max(stats["seconds_max"], seconds)
+        stats["prompt_tokens"] += prompt_tokens
+        stats["response_tokens"] += response_tokens
+        if error:
+            stats["errors"] += 1
+        if error == "timeout":
+            stats["timeouts"] += 1
+
+def _token_counts(response: GenerateContentResponse, prompt: str, text: str) -> Tuple[int, int]:
+    # Newer API versions report usage; otherwise fall back to the candidates' count and an estimate
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        return usage.prompt_token_count, usage.candidates_token_count
+    response_tokens = sum(candidate.token_count for candidate in response.candidates) or estimate_tokens(text)
+    return estimate_tokens(prompt), response_tokens
+
+def generate(model_name: str, prompt: str, call: str, timeout: float = GEMINI_TIMEOUT_SECONDS) -> str:
+    """Run one generate_content call on a shared model with a deadline and return the response text.
+
+    The request goes through the process-wide client, so its connection is
+    reused across calls. Latency and token counts are recorded under call
+    (see gemini_stats). Raises TimeoutError past the deadline; API errors
+    propagate to the caller.
+    """
+    model = get_model(model_name)
+    request = glm.GenerateContentRequest(
+        model=model.model_name,
+        contents=[glm.Content(role="user", parts=[glm.Part(text=prompt)])]
+    )
+    started = time.perf_counter()
+    try:
+        response = GenerateContentResponse.from_response(
+            genai_client.get_default_generative_client().generate_content(request, timeout=timeout)
+        )
+        text = response.text.strip() if response.candidates else ""
+    except api_exceptions.DeadlineExceeded as e:
+        _record(call, time.perf_counter() - started, error="timeout")
+        raise TimeoutError(f"Gemini {call} call exceeded {timeout:g}s") from e
+    except Exception:
+        _record(call, time.perf_counter() - started, error="error")
+        raise
+    seconds = time.perf_counter() - started
+    prompt_tokens, response_tokens = _token_counts(response, prompt, text)
+    _record(call, seconds, prompt_tokens, response_tokens)
+    logger.info(f"Gemini {call} ({model_name}): {seconds:.2f}s, {prompt_tokens} prompt / {response_tokens} response tokens")
+    return text
+
+def gemini_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-call counts, latency and token totals of the Gemini calls made by this process."""
+    with _stats_lock:
+        return {
+            call: {
+                **stats,
+                "seconds_total": round(stats["seconds_total"], 3),
+                "seconds_max": round(stats["seconds_max"], 3),
+                "seconds_avg": round(stats["seconds_total"] / stats["calls"], 3) if stats["calls"] else 0.0
+            }
+            for call, stats in _stats.items()
+        }
@@ -0,0 +1,398 @@
+import asyncio
+import hashlib
+import logging
+import os
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from app.db.crawl_state import delete_page_states, get_page_states, save_page_states
+from app.db.qdrant import delete_source_points, delete_source_positions, get_source_vectors, ingest_to_qdrant
+from app.services.embeddings import get_embeddings
+from app.services.chunking import chunk_text
+from app.services.ingest_scheduler import embed_scheduler, upsert_scheduler
+from app.utils.common import clean_text
+from app.utils.archive import CrawlArchiveWriter, archive_path, list_archives, read_archive, read_archive_records
+from app.utils.crawler import CrawledPage, crawl_pages
+from app.utils.dedup import DEDUP_ENABLED, ContentDeduplicator
+from app.utils.extract import extract_page
+
+load_dotenv()
+
+# Number of chunks embedded and upserted together
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+# Number of new or changed pages collected before they are chunked, embedded and stored
+INGEST_PAGE_BATCH = int(os.getenv("INGEST_PAGE_BATCH", "50"))
+
+# Called as progress(status, **counters)
+ProgressCallback = Callable[..., None]
+
+def content_hash(text: str) -> str:
+    """Hash of extracted page text, used to detect changed pages."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def store_chunks(
+    collection_name: str,
+    chunks: List[str],
+    sources: List[str],
+    positions: List[int],
+    tenant: Optional[str] = None,
+    interactive: bool = False,
+    progress: Optional[ProgressCallback] = None
+) -> Dict[str, float]:
+    """Embed and upsert chunks in EMBED_BATCH_SIZE batches. Returns the counters of this call.
+
+    Every batch waits for a fair share of this process's embed and upsert
+    slots against other tenants' work in the same process (see
+    ingest_scheduler); tenant
+    defaults to the collection. progress, if given, is called per batch
+    with the stage and the chunks_created / embeddings_done /
+    points_upserted / scheduler_wait_seconds of this call.
+    """
+    def report(status: str, **kwargs) -> None:
+        if progress:
+            progress(status, **kwargs)
+
+    tenant = tenant or collection_name
+    counters = {"chunks_created": len(chunks), "embeddings_done": 0, "points_upserted": 0, "scheduler_wait_seconds": 0.0}
+    for i in range(0, len(chunks), EMBED_BATCH_SIZE):
+        batch = chunks[i:i + EMBED_BATCH_SIZE]
+        report("generating_embeddings", **counters)
+        with embed_scheduler.slot(tenant, len(batch), interactive) as waited:
+            embeddings = get_embeddings(batch)
+        counters["embeddings_done"] += len(batch)
+        counters["scheduler_wait_seconds"] = round(counters["scheduler_wait_seconds"] + waited, 3)
+        report("storing", **counters)
+        with upsert_scheduler.slot(tenant, len(batch), interactive) as waited:
+            ingest_to_qdrant(
+                collection_name,
+                batch,
+                embeddings,
+                sources=sources[i:i + EMBED_BATCH_SIZE],
+                positions=positions[i:i + EMBED_BATCH_SIZE]
+            )
+        counters["points_upserted"] += len(batch)
+        counters["scheduler_wait_seconds"] = round(counters["scheduler_wait_seconds"] + waited, 3)
+    return counters
+
+def chunk_hash(chunk: str) -> str:
+    """Short hash of a chunk's text, recorded per position to diff re-uploaded files."""
+    return hashlib.blake2b(chunk.encode("utf-8"), digest_size=8).hexdigest()
+
+def ingest_source_diff(
+    collection_name: str,
+    source: str,
+    chunks: List[str],
+    previous_hashes: Optional[List[str]] = None,
+    tenant: Optional[str] = None,
+    interactive: bool = False
+) -> Dict[str, float]:
+    """Bring one source's points in line with its new chunks, embedding only text not stored before.
+
+    previous_hashes are the chunk hashes recorded when the source was last
+    ingested. A chunk whose position and text are unchanged is left alone.
+    A chunk whose text moved reuses the stored vector under its new
+    position. Only new text is embedded, and positions past the new end
+    are deleted. Without previous_hashes the source is replaced outright.
+    Returns the counters of store_chunks plus chunks_unchanged,
+    chunks_reused and chunks_removed.
+    """
+    if previous_hashes is None:
+        delete_source_points(collection_name, [source])
+        counters = store_chunks(
+            collection_name, chunks, [source] * len(chunks), list(range(len(chunks))),
+            tenant=tenant, interactive=interactive
+        )
+        return {**counters, "chunks_unchanged": 0, "chunks_reused": 0, "chunks_removed": 0}
+
+    hashes = [chunk_hash(chunk) for chunk in chunks]
+    old_positions: Dict[str, int] = {}
+    for position, digest in enumerate(previous_hashes):
+        old_positions.setdefault(digest, position)
+
+    changed = [i for i, digest in enumerate(hashes) if i >= len(previous_hashes) or previous_hashes[i] != digest]
+    # Read every reusable vector before any point of the source is overwritten
+    moved = {i: old_positions[hashes[i]] for i in changed if hashes[i] in old_positions}
+    vectors = get_source_vectors(collection_name, source, sorted(set(moved.values())))
+    reused = [i for i in changed if i in moved and moved[i] in vectors]
+    reused_set = set(reused)
+    fresh = [i for i in changed if i not in reused_set]
+
+    tenant = tenant or collection_name
+    if reused:
+        with upsert_scheduler.slot(tenant, len(reused), interactive):
+            ingest_to_qdrant(
+                collection_name,
+                [chunks[i] for i in reused],
+                [vectors[moved[i]] for i in reused],
+                sources=[source] * len(reused),
+                positions=reused
+            )
+    counters = store_chunks(
+        collection_name, [chunks[i] for i in fresh], [source] * len(fresh), fresh,
+        tenant=tenant, interactive=interactive
+    )
+    stale = list(range(len(chunks), len(previous_hashes)))
+    delete_source_positions(collection_name, source, stale)
+    return {
+        **counters,
+        "points_upserted": counters["points_upserted"] + len(reused),
+        "chunks_unchanged": len(chunks) - len(changed),
+        "chunks_reused": len(reused),
+        "chunks_removed": len(stale)
+    }
+
+def ingest_documents(
+    collection_name: str,
+    documents: List[Tuple[str, str]],
+    deduplicator: Optional[ContentDeduplicator] = None,
+    progress: Optional[ProgressCallback] = None,
+    tenant: Optional[str] = None
+) -> Dict[str, float]:
+    """Chunk, embed and store (source, text) documents. Returns the counters of store_chunks.
+
+    Existing points of the same sources are deleted first, so a changed page
+    or file is replaced rather than duplicated. With a deduplicator, chunks
+    that nearly duplicate one already stored in the same run are dropped
+    before embedding.
+    """
+    sources: List[str] = []
+    positions: List[int] = []
+    chunks: List[str] = []
+    for source, text in documents:
+        for position, chunk in enumerate(chunk_text(text)):
+            if chunk.strip() and (deduplicator is None or deduplicator.keep_chunk(chunk)):
+                sources.append(source)
+                positions.append(position)
+                chunks.append(chunk)
+
+    delete_source_points(collection_name, [source for source, _ in documents])
+    return store_chunks(collection_name, chunks, sources, positions, tenant=tenant, progress=progress)
+
+async def ingest_page_stream(
+    collection_name: str,
+    pages: AsyncIterator[CrawledPage],
+    known: Dict[str, dict],
+    incremental: bool = False,
+    archive: Optional[CrawlArchiveWriter] = None,
+    progress: Optional[ProgressCallback] = None,
+    tenant: Optional[str] = None
+) -> Dict[str, int]:
+    """Clean, chunk, embed and store a stream of crawled pages, batch by batch.
+
+    Only INGEST_PAGE_BATCH pages of extracted text are held in memory at a
+    time. Pages with HTML are appended to archive, if given, before they
+    are processed. With incremental, pages answering 304 or whose extracted
+    text hash matches known are skipped. Known pages that are gone
+    (404/410) have their points removed. Unless DEDUP_ENABLED is off,
+    blocks repeated across many pages (navigation, footers, cookie banners)
+    and near-duplicate chunks are dropped before embedding. Returns page
+    and chunk counters.
+    """
+    def report(status: str, **kwargs) -> None:
+        if progress:
+            progress(status, **kwargs)
+
+    stats = {
+        "pages_scraped": 0,
+        "pages_changed": 0,
+        "pages_unchanged": 0,
+        "pages_removed": 0,
+        "chunks_created": 0,
+        "embeddings_done": 0,
+        "points_upserted": 0,
+        "scheduler_wait_seconds": 0.0,
+        "blocks_removed": 0,
+        "chunks_deduplicated": 0
+    }
+    deduplicator = ContentDeduplicator() if DEDUP_ENABLED else None
+    pending_documents: List[Tuple[str, str]] = []
+    pending_states: List[Tuple[str, Optional[str], Optional[str], Optional[str]]] = []
+    unchanged_states: List[Tuple[str, Optional[str], Optional[str], Optional[str]]] = []
+
+    async def flush() -> None:
+        if not pending_documents:
+            return
+        report("processing", **stats)
+
+        def batch_progress(status: str, **counters) -> None:
+            # Counters of this flush on top of the totals so far
+            report(status, **{**stats, **{key: stats[key] + value for key, value in counters.items()}})
+
+        counters = await asyncio.to_thread(
+            ingest_documents, collection_name, list(pending_documents), deduplicator,
+            batch_progress if progress else None, tenant
+        )
+        await asyncio.to_thread(save_page_states, collection_name, list(pending_states))
+        stats["pages_changed"] += len(pending_documents)
+        for key, value in counters.items():
+            stats[key] = round(stats[key] + value, 3)
+        if deduplicator:
+            stats["blocks_removed"] = deduplicator.blocks_removed
+            stats["chunks_deduplicated"] = deduplicator.chunks_removed
+        pending_documents.clear()
+        pending_states.clear()
+        report("crawling", **stats)
+
+    async for page in pages:
+        stats["pages_scraped"] += 1
+        if page.status == 304:
+            stats["pages_unchanged"] += 1
+            continue
+        if archive:
+            await asyncio.to_thread(archive.write, page)
+        if page.html is None:
+            if page.url in known:
+                await asyncio.to_thread(delete_source_points, collection_name, [page.url])
+                await asyncio.to_thread(delete_page_states, collection_name, [page.url])
+                stats["pages_removed"] += 1
+            continue
+
+        text = page.text if page.text is not None else await asyncio.to_thread(clean_text, page.html)
+        digest = content_hash(text)
+        state = (page.url, page.etag, page.last_modified, digest)
+        if incremental and known.get(page.url, {}).get("content_hash") == digest:
+            stats["pages_unchanged"] += 1
+            unchanged_states.append(state)
+            continue
+
+        if deduplicator:
+            # Filter after hashing so the stored hash reflects the whole page
+            text = deduplicator.filter_page(text)
+        pending_documents.append((page.url, text))
+        pending_states.append(state)
+        if len(pending_documents) >= INGEST_PAGE_BATCH:
+            await flush()
+
+    await flush()
+    # Refresh validators of pages whose content did not change
+    await asyncio.to_thread(save_page_states, collection_name, unchanged_states)
+    return stats
+
+def scan_partial_archive(path: str, known: Dict[str, dict]) -> Tuple[Set[str], Set[str], List[CrawledPage]]:
+    """Recover an interrupted crawl from its archive.
+
+    Returns the URLs already fetched, the links found on them, and the
+    archived pages whose text was not yet ingested (no matching content
+    hash in known), with their text extracted. A record cut short by the
+    interruption is truncated off the file, so the resumed run appends
+    after the last complete record.
+    """
+    fetched: Set[str] = set()
+    links: Set[str] = set()
+    pending: List[CrawledPage] = []
+    end = 0
+    for page, end in read_archive_records(path):
+        fetched.add(page.url)
+        if page.html is None:
+            continue
+        extracted = extract_page(page.html, page.url)
+        links.update(extracted.links)
+        text = "\n".join(extracted.blocks)
+        if known.get(page.url, {}).get("content_hash") != content_hash(text):
+            pending.append(page._replace(text=text))
+    if os.path.getsize(path) > end:
+        with open(path, "r+b") as f:
+            f.truncate(end)
+        logging.info(f"Truncated crawl archive {path} to its last complete record ({end} bytes)")
+    return fetched, links - fetched, pending
+
+async def _iterate(pages: List[CrawledPage]) -> AsyncIterator[CrawledPage]:
+    for page in pages:
+        yield page
+
+async def crawl_and_ingest(
+    collection_name: str,
+    start_url: str,
+    max_pages: Optional[int] = None,
+    incremental: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    job_id: Optional[str] = None,
+    resume: bool = False,
+    tenant: Optional[str] = None
+) -> Dict[str, int]:
+    """Crawl a site and ingest its pages into a collection as they arrive.
+
+    With incremental, pages crawled before are requested conditionally
+    (If-None-Match / If-Modified-Since) and seeded into the frontier. Only
+    new or changed pages are re-chunked and re-embedded. With job_id, the
+    fetched HTML is spilled to the job's compressed crawl archive so the
+    site can be re-ingested later without re-crawling.
+
+    With resume, an interrupted run of the same job continues from its
+    archive: archived pages that were not ingested yet are ingested first,
+    pages already fetched are not requested again, and the links found on
+    them seed the frontier. Embedding and storage are scheduled fairly
+    against other tenants' jobs in the same worker process under tenant
+    (default: the collection).
+    """
+    known = await asyncio.to_thread(get_page_states, collection_name)
+    validators = {url: (state['etag'], state['last_modified']) for url, state in known.items()} if incremental else None
+    seed_urls = list(known) if incremental else []
+    fetched: Set[str] = set()
+    resumed: Optional[Dict[str, int]] = None
+
+    path = archive_path(collection_name, job_id) if job_id else None
+    if resume and path and os.path.exists(path):
+        fetched, links, pending = await asyncio.to_thread(scan_partial_archive, path, known)
+        logging.info(f"Resuming crawl of {start_url}: {len(fetched)} pages already fetched, {len(pending)} to ingest")
+        resumed = await ingest_page_stream(collection_name, _iterate(pending), known, progress=progress, tenant=tenant)
+        seed_urls += list(links)
+        if max_pages is not None:
+            max_pages = max(0, max_pages - len(fetched))
+
+    stats: Dict[str, int] = {}
+    if max_pages is None or max_pages > 0:
+        pages = crawl_pages(
+            start_url,
+            max_pages=max_pages,
+            on_progress=(lambda count, queued: progress("crawling", pages_scraped=count, pages_queued=queued)) if progress else None,
+            validators=validators,
+            seed_urls=seed_urls or None,
+            seen_urls=fetched
+        )
+        archive = CrawlArchiveWriter(path) if path else None
+        try:
+            stats = await ingest_page_stream(collection_name, pages, known, incremental, archive, progress, tenant)
+        finally:
+            if archive:
+                archive.close()
+
+    if resumed:
+        stats = {key: stats.get(key, 0) + resumed.get(key, 0) for key in {*stats, *resumed}}
+        stats["pages_scraped"] += len(fetched) - resumed["pages_scraped"]
+
+    logging.info(f"Ingest of {start_url} into {collection_name} finished: {stats}")
+    return stats
+
+async def _archived_pages(paths: List[str]) -> AsyncIterator[CrawledPage]:
+    """Stream the latest archived copy of each URL across archives given newest first."""
+    seen = set()
+    for path in paths:
+        records = read_archive(path)
+        while True:
+            page = await asyncio.to_thread(next, records, None)
+            if page is None:
+                break
+            if page.url in seen:
+                continue
+            seen.add(page.url)
+            yield page
+
+async def reingest_from_archives(
+    collection_name: str,
+    progress: Optional[ProgressCallback] = None,
+    tenant: Optional[str] = None
+) -> Dict[str, int]:
+    """Re-chunk and re-embed a collection's crawled pages from its archives, without re-crawling.
+
+    Useful after changing the chunker or the embedding model. The newest
+    archived copy of each URL wins; pages archived as gone are dropped.
+    """
+    paths = list_archives(collection_name)
+    if not paths:
+        raise ValueError(f"No crawl archives found for collection {collection_name}")
+    known = await asyncio.to_thread(get_page_states, collection_name)
+    stats = await ingest_page_stream(collection_name, _archived_pages(paths), known, progress=progress, tenant=tenant)
+    logging.info(f"Re-ingest of {collection_name} from {len(paths)} archive(s) finished: {stats}")
+    return stats
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Embedding batches run at the same time in one process (embedding is CPU/GPU bound)
+INGEST_EMBED_SLOTS = int(os.getenv("INGEST_EMBED_SLOTS", "1"))
+# Qdrant upsert batches run at the same time in one process
+INGEST_UPSERT_SLOTS = int(os.getenv("INGEST_UPSERT_SLOTS", "2"))
+# Slots of each kind a single tenant may hold at once in one process
+INGEST_TENANT_MAX_SLOTS = int(os.getenv("INGEST_TENANT_MAX_SLOTS", "1"))
+# Share of an interactive batch relative to a background batch of the same size in the same process
+INGEST_INTERACTIVE_WEIGHT = float(os.getenv("INGEST_INTERACTIVE_WEIGHT", "4"))
+
+class _Request:
+    __slots__ = ("tenant", "finish", "enqueued_at")
+
+    def __init__(self, tenant: str, finish: float):
+        self.tenant = tenant
+        self.finish = finish
+        self.enqueued_at = time.monotonic()
+
+class FairScheduler:
+    """Weighted fair queuing of ingestion batches across tenants.
+
+    Each batch gets a virtual finish tag of start + cost / weight, where
+    start is the later of the scheduler's virtual time and the tenant's
+    previous tag. Free slots go to the waiting batch with the smallest tag
+    whose tenant is under its cap. A tenant with a 20k-page crawl therefore
+    takes turns with everyone else instead of queueing them behind it, and
+    a small interactive batch (low cost, higher weight) goes ahead of
+    large background batches.
+
+    The scheduler is in-memory state, so fairness and the tenant cap hold
+    per process only. Each worker process schedules its own jobs and
+    applies INGEST_TENANT_MAX_SLOTS separately, so a tenant can hold that
+    many slots in every worker. Single-file uploads are embedded in the API
+    process, where they only compete with other uploads; they do not take
+    priority over the crawls and bulk uploads running in the workers.
+    """
+
+    def __init__(self, name: str, slots: int, tenant_slots: int):
+        self.name = name
+        self.slots = max(1, slots)
+        self.tenant_slots = max(1, tenant_slots)
+        self._cond = threading.Condition()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._waiting: List[_Request] = []
+        self._running: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _next(self) -> Optional[_Request]:
+        if sum(self._running.values()) >= self.slots:
+            return None
+        eligible = [request for request in self._waiting if self._running.get(request.tenant, 0) < self.tenant_slots]
+        return min(eligible, key=lambda request: request.finish, default=None)
+
+    def acquire(self, tenant: str, cost: int, interactive: bool = False) -> float:
+        """Block until a batch of cost units may run. Returns the seconds it waited."""
+        weight = INGEST_INTERACTIVE_WEIGHT if interactive else 1.0
+        with self._cond:
+            start = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+            request = _Request(tenant, start + max(cost, 1) / weight)
+            self._last_finish[tenant] = request.finish
+            self._waiting.append(request)
+            while self._next() is not request:
+                self._cond.wait()
+            self._waiting.remove(request)
+            self._running[tenant] = self._running.get(tenant, 0) + 1
+            self._virtual_time = max(self._virtual_time, request.finish)
+
+            waited = time.monotonic() - request.enqueued_at
+            stats = self._stats.setdefault(tenant, {"batches": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0})
+            stats["batches"] += 1
+            stats["wait_seconds"] += waited
+            stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+            # Another slot may still be free for the next waiting batch
+            self._cond.notify_all()
+            return waited
+
+    def release(self, tenant: str) -> None:
+        with self._cond:
+            self._running[tenant] -= 1
+            if not self._running[tenant]:
+                del self._running[tenant]
+                if not any(request.tenant == tenant for request in self._waiting):
+                    # An idle tenant restarts from the virtual time when it returns
+                    self._last_finish.pop(tenant, None)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tenant: str, cost: int, interactive: bool = False) -> Iterator[float]:
+        """Hold a slot for the duration of the block; yields the seconds waited for it."""
+        waited = self.acquire(tenant, cost, interactive)
+        try:
+            yield waited
+        finally:
+            self.release(tenant)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth, running batches and wait times per tenant seen by this process."""
+        with self._cond:
+            view = {}
+            for tenant in {*self._stats, *self._running, *(request.tenant for request in self._waiting)}:
+                stats = self._stats.get(tenant, {"batches": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0})
+                view[tenant] = {
+                    "waiting": sum(1 for request in self._waiting if request.tenant == tenant),
+                    "running": self._running.get(tenant, 0),
+                    "batches": stats["batches"],
+                    "avg_wait_seconds": round(stats["wait_seconds"] / stats["batches"], 3) if stats["batches"] else 0.0,
+                    "max_wait_seconds": round(stats["max_wait_seconds"], 3)
+                }
+            return view
+
+embed_scheduler = FairScheduler("embed", INGEST_EMBED_SLOTS, INGEST_TENANT_MAX_SLOTS)
+upsert_scheduler = FairScheduler("upsert", INGEST_UPSERT_SLOTS, INGEST_TENANT_MAX_SLOTS)
+
+def scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-tenant embed and upsert queue stats of this process."""
+    embed = embed_scheduler.stats()
+    upsert = upsert_scheduler.stats()
+    return {tenant: {"embed": embed.get(tenant), "upsert": upsert.get(tenant)} for tenant in {*embed, *upsert}}
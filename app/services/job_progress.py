@@ -0,0 +1,116 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db.jobs import EVENT_PROGRESS, EVENT_STAGE, STATUS_COMPLETED, STATUS_ERROR, STATUS_QUEUED
+
+# Stages shown on the dashboard, in pipeline order. Crawling and the
+# processing stages alternate while pages are ingested in batches.
+STAGES = ["crawling", "processing", "generating_embeddings", "storing", "completed"]
+
+class JobProgress:
+    """Live status and counters of one running job.
+
+    update() is the pipeline's progress callback and may be called from the
+    event loop or from ingestion threads. Stage transitions are queued as
+    they happen; drain() hands them to the worker's heartbeat together with
+    one progress snapshot, so the database sees every transition but at
+    most one write per heartbeat.
+    """
+
+    def __init__(self, max_pages: Optional[int] = None):
+        self.max_pages = max_pages
+        self.status = "running"
+        self.counters: Dict[str, Any] = {}
+        self.stages_seen: List[str] = []
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._events: List[Tuple[str, Dict[str, Any]]] = []
+        self._dirty = False
+
+    def update(self, status: str, **counters) -> None:
+        with self._lock:
+            self.counters.update(counters)
+            self._dirty = True
+            if status != self.status:
+                self.status = status
+                if status not in self.stages_seen:
+                    self.stages_seen.append(status)
+                self._events.append((EVENT_STAGE, self._snapshot()))
+
+    def _snapshot(self) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        counters = dict(self.counters)
+        pages = counters.get("pages_scraped", 0)
+        pages_per_second = pages / elapsed
+        counters["elapsed_seconds"] = round(elapsed, 1)
+        counters["pages_per_second"] = round(pages_per_second, 2)
+        counters["chunks_per_second"] = round(counters.get("points_upserted", 0) / elapsed, 2)
+
+        # Pages still to fetch: the frontier, bounded by the crawl budget
+        remaining = counters.get("pages_queued")
+        if self.max_pages is not None:
+            budget = max(self.max_pages - pages, 0)
+            remaining = budget if remaining is None else min(remaining, budget)
+        counters["eta_seconds"] = round(remaining / pages_per_second) if remaining is not None and pages_per_second > 0 else None
+        return {"status": self.status, "stages_seen": list(self.stages_seen), "counters": counters}
+
+    def drain(self) -> Tuple[Dict[str, Any], List[Tuple[str, Dict[str, Any]]]]:
+        """Return the current snapshot and the events recorded since the last drain."""
+        with self._lock:
+            snapshot = self._snapshot()
+            events = self._events
+            if self._dirty:
+                events.append((EVENT_PROGRESS, snapshot))
+            self._events = []
+            self._dirty = False
+            return snapshot, events
+
+def _percent(done: Optional[int], total: Optional[int]) -> Optional[int]:
+    if not total:
+        return None
+    return min(100, int(100 * (done or 0) / total))
+
+def render_job_view(
+    status: str,
+    counters: Dict[str, Any],
+    stages_seen: Optional[List[str]] = None,
+    error: Optional[str] = None,
+    result: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Dashboard message for a job: per-stage state, the current stage and live counters."""
+    stages_seen = stages_seen or []
+    finished = status in (STATUS_COMPLETED, STATUS_ERROR)
+    stage_progress = {
+        "crawling": _percent(
+            counters.get("pages_scraped"),
+            counters.get("pages_scraped", 0) + counters.get("pages_queued", 0)
+        ),
+        "generating_embeddings": _percent(counters.get("embeddings_done"), counters.get("chunks_created")),
+        "storing": _percent(counters.get("points_upserted"), counters.get("chunks_created")),
+    }
+
+    states = {}
+    for stage in STAGES:
+        title = stage.replace("_", " ").title()
+        if status == STATUS_COMPLETED or (stage in stages_seen and stage != status):
+            states[stage] = {"status": "completed", "message": f"{title} completed", "progress": 100}
+        elif stage == status:
+            progress = stage_progress.get(stage)
+            message = f"{title}: {progress}% complete" if progress is not None else f"{title}..."
+            states[stage] = {"status": "active", "message": message, "progress": progress}
+        else:
+            states[stage] = {"status": "pending", "message": f"Waiting to start {stage.replace('_', ' ')}...", "progress": 0}
+
+    view = {
+        "states": states,
+        "current_state": status,
+        "counters": counters,
+        "is_complete": finished,
+        "is_queued": status == STATUS_QUEUED
+    }
+    if error:
+        view["error"] = error
+    if result is not None:
+        view["result"] = result
+    return view
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+import os
+from typing import AsyncIterator, Dict, Optional, Set
+
+from dotenv import load_dotenv
+
+from app.db.jobs import (
+    EVENT_COMPLETED, FINISHED_STATUSES, STATUS_COMPLETED, STATUS_ERROR, TERMINAL_EVENTS,
+    get_job, get_job_events, get_last_event_id
+)
+from app.services.job_progress import render_job_view
+
+load_dotenv()
+
+# Seconds between reads of a followed job's new events (one reader per job, however many clients follow it)
+JOB_STREAM_POLL_SECONDS = float(os.getenv("JOB_STREAM_POLL_SECONDS", "0.5"))
+# Seconds between SSE keep-alive comments on an idle stream
+JOB_STREAM_KEEPALIVE_SECONDS = float(os.getenv("JOB_STREAM_KEEPALIVE_SECONDS", "15"))
+
+class JobBroadcaster:
+    """Reads one job's events from the database and fans them out to every subscriber.
+
+    Created on the first subscription and stopped when the last subscriber
+    leaves or the job finishes, so the database load per job stays
+    constant no matter how many dashboard tabs follow it.
+    """
+
+    def __init__(self, job_id: str, after_id: int):
+        self.job_id = job_id
+        self.after_id = after_id
+        self.subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.discard(queue)
+
+    async def _run(self) -> None:
+        try:
+            last_id = self.after_id
+            while self.subscribers:
+                events = await asyncio.to_thread(get_job_events, self.job_id, last_id)
+                for event in events:
+                    last_id = event['id']
+                    for queue in self.subscribers:
+                        queue.put_nowait(event)
+                if any(event['event_type'] in TERMINAL_EVENTS for event in events):
+                    break
+                if not events:
+                    await asyncio.sleep(JOB_STREAM_POLL_SECONDS)
+        except Exception as e:
+            logging.error(f"Event stream of job {self.job_id} failed: {e}")
+        finally:
+            _broadcasters.pop(self.job_id, None)
+            for queue in self.subscribers:
+                queue.put_nowait(None)
+
+_broadcasters: Dict[str, JobBroadcaster] = {}
+
+def _sse(view: dict, event_id: Optional[int] = None) -> str:
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}data: {json.dumps(view, default=str)}\n\n"
+
+def _job_view(job: dict) -> dict:
+    progress = dict(job.get('progress') or {})
+    stages_seen = progress.pop("stages_seen", [])
+    return render_job_view(job['status'], progress, stages_seen, job.get('error'), job.get('result'))
+
+async def stream_job(job_id: str) -> AsyncIterator[str]:
+    """Server-sent events for a job: its current state, then every stage change and progress update.
+
+    Every message carries the full view (states, current_state, counters),
+    so a client that reconnects only needs the first message to catch up.
+    The stream ends once the job completes or fails.
+    """
+    # Take the event cursor before the snapshot, so nothing after the snapshot is missed
+    after_id = await asyncio.to_thread(get_last_event_id, job_id)
+    job = await asyncio.to_thread(get_job, job_id)
+    if not job:
+        yield _sse({"error": "Task not found", "is_complete": True})
+        return
+    yield _sse(_job_view(job))
+    if job['status'] in FINISHED_STATUSES:
+        return
+
+    broadcaster = _broadcasters.get(job_id)
+    if broadcaster is None:
+        broadcaster = _broadcasters[job_id] = JobBroadcaster(job_id, after_id)
+    queue = broadcaster.subscribe()
+    try:
+        stages_seen = list((job.get('progress') or {}).get("stages_seen", []))
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=JOB_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                # The reader stopped without a final event (e.g. a database error); send the stored state
+                job = await asyncio.to_thread(get_job, job_id)
+                if job:
+                    yield _sse(_job_view(job))
+                return
+
+            data = event['data'] or {}
+            if event['event_type'] in TERMINAL_EVENTS:
+                status = STATUS_COMPLETED if event['event_type'] == EVENT_COMPLETED else STATUS_ERROR
+                job = await asyncio.to_thread(get_job, job_id)
+                counters = dict((job or {}).get('progress') or {})
+                counters.pop("stages_seen", None)
+                yield _sse(render_job_view(status, counters, stages_seen, data.get('error'), data.get('result')), event['id'])
+                return
+            stages_seen = data.get("stages_seen", stages_seen)
+            yield _sse(render_job_view(data.get("status"), data.get("counters", {}), stages_seen), event['id'])
+    finally:
+        broadcaster.unsubscribe(queue)
@@ -0,0 +1,97 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.common import estimate_tokens
+
+# Static instructions shared by every answer prompt, built once at import
+PROMPT_PREAMBLE = (
+    "You are the official AI assistant of the company, designed to be smart, professional, and friendly.\n"
+    "Use the internal company content below to help answer the user's question. Prioritize providing comprehensive and helpful information based on the provided context.\n\n"
+
+    "🎯 Output Format Instructions:\n"
+    "- ONLY return a **valid raw JSON object**. Do NOT include markdown (```json), quotes, or any extra text outside the JSON structure.\n"
+    "- The JSON must contain exactly these 4 keys:\n"
+    "  1. 'response': string → a clear, helpful, and grammatically correct explanation or answer to the user's question. This field should be detailed and comprehensive, drawing as much relevant information as possible from the provided context. **You may use Markdown elements within this string to enhance readability for UI display:**\n"
+    "     - Use `\\n` for new paragraphs or line breaks.\n"
+    "     - Use `**text**` for bolding important keywords or phrases.\n"
+    "     - Avoid complex Markdown (e.g., headings, lists, tables) beyond `\\n` and `**` to keep the response concise and parseable.\n"
+    "  2. 'buttons': boolean → true **only if actionable info** (email, phone, LinkedIn, etc.) is found in the context and relevant to the question.\n"
+    "  3. 'button_type': list of strings like [\"email\", \"linkedin\", \"website\", \"phone\"], or null if buttons is false.\n"
+    "  4. 'button_data': list of actual values from context matching the types above, or null if buttons is false.\n\n"
+
+    "🧠 Rules:\n"
+    "- If the user greets you (e.g., says 'hi', 'hello', 'hey'), respond warmly and naturally. For greetings, a concise, friendly response is appropriate.\n"
+    "- If the question is general or out-of-scope but can be answered politely, do so in a professional tone. If no relevant information is in the context for an out-of-scope question, state that you can only answer questions related to the company content.\n"
+    "- **Elaborate and provide details** in the 'response' field by synthesizing information from the 'Internal Company Content'. Aim for a thorough explanation that directly addresses the user's query.\n"
+    "- Use only real data from the context for button values. Never guess or hallucinate values.\n"
+    "- If no actionable data is present or needed, set:\n"
+    "  \"buttons\": false,\n"
+    "  \"button_type\": null,\n"
+    "  \"button_data\": null\n\n"
+
+    "✅ Example Output:\n"
+    '{\n'
+    '  "response": "Welcome!\\n\\nI\'m here to help you with any questions about the company. I can provide **detailed information** on our products, services, contact options, and more, based on the internal company content I have access to. How can I assist you today with a specific query about our company?",\n'
+    '  "buttons": false,\n'
+    '  "button_type": null,\n'
+    '  "button_data": null\n'
+    '}\n\n'
+
+    "OR (if contact info is found and a detailed response is still needed):\n"
+    '{\n'
+    '  "response": "You can reach our support team through multiple channels.\\n\\nFor general inquiries or technical assistance, the most direct method is via **email at info@company.com**. If you prefer to connect on professional networking platforms, our official **LinkedIn page**, accessible at https://linkedin.com/company/example, is regularly updated with company news and job openings. We aim to respond to all inquiries within 24 business hours.",\n'
+    '  "buttons": true,\n'
+    '  "button_type": ["email", "linkedin"],\n'
+    '  "button_data": ["info@company.com", "https://linkedin.com/company/example"]\n'
+    '}\n\n'
+)
+PREAMBLE_TOKENS = estimate_tokens(PROMPT_PREAMBLE)
+
+def format_context(search_results: List[Dict[str, Any]]) -> str:
+    """Render retrieved chunks as numbered, deduplicated plain text with their source when known."""
+    seen = set()
+    blocks = []
+    for result in search_results:
+        payload = result.get("payload") or {}
+        text = (payload.get("text") or "").strip()
+        if not text or text in seen:
+            continue
+        seen.add(text)
+        source = (payload.get("metadata") or {}).get("source")
+        header = f"[{len(blocks) + 1}] {source}" if source else f"[{len(blocks) + 1}]"
+        blocks.append(f"{header}\n{text}")
+    return "\n\n".join(blocks)
+
+def format_conversation(conversation_history: Optional[List[Dict[str, str]]]) -> str:
+    """Render previous conversation turns for the prompt."""
+    if not conversation_history:
+        return ""
+    lines = ["Previous conversation:"]
+    for msg in conversation_history:
+        role = msg.get("role", "user")
+        content = msg.get("content", "")
+        lines.append(f"{role.capitalize()}: {content}")
+    return "\n".join(lines) + "\n\n"
+
+def build_prompt(
+    question: str,
+    context_text: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None
+) -> Tuple[str, Dict[str, int]]:
+    """Assemble the answer prompt and estimate its token count per section.
+
+    Returns the prompt and a dict with 'preamble', 'history', 'context',
+    'question' and 'total' token estimates.
+    """
+    history = format_conversation(conversation_history)
+    context = f"📄 Internal Company Content:\n{context_text}\n\n"
+    tail = f"❓ User Question:\n{question}\n\n✍️ Please respond now with the final raw JSON object only:"
+    prompt = PROMPT_PREAMBLE + history + context + tail
+
+    token_counts = {
+        "preamble": PREAMBLE_TOKENS,
+        "history": estimate_tokens(history),
+        "context": estimate_tokens(context),
+        "question": estimate_tokens(tail)
+    }
+    token_counts["total"] = sum(token_counts.values())
+    return prompt, token_counts
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import os
+from typing import List
+
+from dotenv import load_dotenv
+
+from app.db.jobs import JOB_SCRAPE, enqueue_job, has_pending_job, new_job_id
+from app.db.mysql import get_db_connection
+
+load_dotenv()
+
+# Hours between scheduled refreshes of every chatbot's source_url; 0 disables the scheduler
+RECRAWL_INTERVAL_HOURS = float(os.getenv("RECRAWL_INTERVAL_HOURS", "0"))
+# Maximum pages requested per chatbot per recrawl
+RECRAWL_MAX_PAGES = int(os.getenv("RECRAWL_MAX_PAGES", "500"))
+
+def get_recrawl_targets() -> List[dict]:
+    """Active chatbots that were built from a website."""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT collection_name, source_url, user_id FROM chatbots
+            WHERE is_active = TRUE AND source_url IS NOT NULL AND source_url <> ''
+        """)
+        targets = cursor.fetchall()
+        cursor.close()
+        return targets
+    finally:
+        connection.close()
+
+def enqueue_recrawls() -> int:
+    """Queue an incremental recrawl of every chatbot's source_url. Returns the number queued.
+
+    Chatbots that already have a job queued or running are skipped, so
+    several workers running the scheduler do not pile up duplicate jobs.
+    """
+    targets = get_recrawl_targets()
+    queued = 0
+    for target in targets:
+        if has_pending_job(target['collection_name']):
+            continue
+        enqueue_job(
+            new_job_id(),
+            JOB_SCRAPE,
+            target['collection_name'],
+            target['source_url'],
+            params={"incremental": True, "max_pages": RECRAWL_MAX_PAGES},
+            tenant_id=target['user_id']
+        )
+        queued += 1
+    logging.info(f"Scheduled recrawl: queued {queued} of {len(targets)} chatbot(s)")
+    return queued
+
+async def run_recrawl_scheduler() -> None:
+    """Queue recrawls of all chatbots every RECRAWL_INTERVAL_HOURS until cancelled."""
+    while True:
+        await asyncio.sleep(RECRAWL_INTERVAL_HOURS * 3600)
+        try:
+            await asyncio.to_thread(enqueue_recrawls)
+        except Exception as e:
+            logging.error(f"Failed to queue scheduled recrawls: {e}")
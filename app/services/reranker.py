@@ -0,0 +1,86 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+import hashlib
+import logging
+import os
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Set to 'true' to rerank over-fetched candidates with a cross-encoder before building the prompt
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Number of candidates fetched from Qdrant and scored by the cross-encoder
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+# Number of reranked chunks kept for the prompt
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "3"))
+# Maximum number of (query, point) scores kept in memory
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+
+_reranker_model = None
+_model_lock = threading.Lock()
+
+# (query hash, point id) -> (text hash, score); the text hash guards against re-ingested points
+_score_cache: "OrderedDict[Tuple[str, Any], Tuple[str, float]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def get_reranker_model():
+    """Load the cross-encoder on first use (CPU)."""
+    global _reranker_model
+    if _reranker_model is None:
+        with _model_lock:
+            if _reranker_model is None:
+                from sentence_transformers import CrossEncoder
+                _reranker_model = CrossEncoder(RERANK_MODEL, device="cpu")
+                logging.info(f"Reranker model {RERANK_MODEL} loaded successfully")
+    return _reranker_model
+
+def _hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def rerank(query: str, hits: List[Dict[str, Any]], top_n: int = RERANK_TOP_N) -> List[Dict[str, Any]]:
+    """Score (query, chunk) pairs with the cross-encoder and return the top_n hits.
+
+    Cached scores are reused; all uncached pairs are scored in a single batch.
+    Each returned hit carries the cross-encoder score under 'score' and
+    'rerank_score' and keeps its retrieval score under 'retrieval_score'.
+    On failure the hits are returned in their original order.
+    """
+    if not hits:
+        return []
+    try:
+        query_hash = _hash(query.strip().lower())
+        scores: Dict[int, float] = {}
+        pending = []
+
+        with _cache_lock:
+            for i, hit in enumerate(hits):
+                text = (hit.get("payload") or {}).get("text", "")
+                cached = _score_cache.get((query_hash, hit["id"]))
+                if cached and cached[0] == _hash(text):
+                    _score_cache.move_to_end((query_hash, hit["id"]))
+                    scores[i] = cached[1]
+                else:
+                    pending.append((i, text))
+
+        if pending:
+            predicted = get_reranker_model().predict([(query, text) for _, text in pending])
+            with _cache_lock:
+                for (i, text), score in zip(pending, predicted):
+                    scores[i] = float(score)
+                    _score_cache[(query_hash, hits[i]["id"])] = (_hash(text), float(score))
+                while len(_score_cache) > RERANK_CACHE_SIZE:
+                    _score_cache.popitem(last=False)
+
+        logging.info(f"Reranked {len(hits)} candidates ({len(hits) - len(pending)} cached)")
+        reranked = [
+            {**hit, "retrieval_score": hit.get("score"), "score": scores[i], "rerank_score": scores[i]}
+            for i, hit in enumerate(hits)
+        ]
+        reranked.sort(key=lambda x: x["score"], reverse=True)
+        return reranked[:top_n]
+    except Exception as e:
+        logging.error(f"Failed to rerank candidates: {e}")
+        return hits[:top_n]
@@ -0,0 +1,76 @@
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List, Tuple
+import logging
+
+# BM25 term-frequency saturation and length normalisation parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Compound tokens keep emails, SKUs, versions and URLs intact ("ab-1234", "info@company.com")
+COMPOUND_TOKEN_PATTERN = re.compile(r"\w[\w@.+/-]*\w|\w")
+WORD_PATTERN = re.compile(r"\w+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "does", "for", "from",
+    "has", "have", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "our", "so",
+    "that", "the", "their", "there", "this", "to", "was", "we", "what", "when", "where",
+    "which", "who", "why", "will", "with", "you", "your"
+}
+
+SparseVectorData = Tuple[List[int], List[float]]
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase search tokens.
+
+    Compound tokens such as emails or product codes are kept whole and also
+    split into their word parts, so both exact and partial matches score.
+    """
+    tokens = []
+    for match in COMPOUND_TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in WORD_PATTERN.findall(token) if part not in STOPWORDS)
+    return tokens
+
+def token_index(token: str) -> int:
+    """Map a token to a stable sparse vector dimension."""
+    return zlib.crc32(token.encode("utf-8"))
+
+def _to_sparse(weights: Dict[int, float]) -> SparseVectorData:
+    indices = sorted(weights)
+    return indices, [weights[i] for i in indices]
+
+def get_sparse_embeddings(texts: List[str]) -> List[SparseVectorData]:
+    """Generate BM25-weighted sparse vectors (indices, values) for a list of texts.
+
+    Document length is normalised against the average length of the batch.
+    Qdrant scores sparse vectors with a dot product, so the query side only
+    needs to mark which terms are present (see get_question_sparse_embedding).
+    """
+    try:
+        if not texts:
+            return []
+        tokenized = [tokenize(text) for text in texts]
+        avg_len = (sum(len(tokens) for tokens in tokenized) / len(tokenized)) or 1.0
+
+        vectors = []
+        for tokens in tokenized:
+            length_norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / avg_len)
+            weights: Dict[int, float] = {}
+            for token, tf in Counter(tokens).items():
+                index = token_index(token)
+                weights[index] = weights.get(index, 0.0) + tf * (BM25_K1 + 1) / (tf + length_norm)
+            vectors.append(_to_sparse(weights))
+        return vectors
+    except Exception as e:
+        logging.error(f"Failed to generate sparse embeddings: {e}")
+        raise
+
+def get_question_sparse_embedding(question: str) -> SparseVectorData:
+    """Generate the sparse query vector for a question (one unit weight per distinct term)."""
+    return _to_sparse({token_index(token): 1.0 for token in set(tokenize(question))})
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict
+
+from dotenv import load_dotenv
+
+from app.db.mysql import init_db
+from app.db.qdrant import get_qdrant
+from app.services.embeddings import warmup_embeddings
+from app.services.reranker import RERANK_ENABLED, get_reranker_model
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Seconds between attempts to initialize a dependency that failed to come up
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))
+
+# Component name -> {"ready", "seconds" or "error", "attempts"}
+_status: Dict[str, Dict[str, Any]] = {}
+
+def warmup_reranker() -> None:
+    get_reranker_model().predict([("warmup", "warmup")], show_progress_bar=False)
+
+def _components() -> Dict[str, Callable[[], Any]]:
+    components = {
+        "database": init_db,
+        "qdrant": get_qdrant,
+        "embeddings": warmup_embeddings,
+    }
+    if RERANK_ENABLED:
+        components["reranker"] = warmup_reranker
+    return components
+
+async def _start(name: str, init: Callable[[], Any]) -> None:
+    attempts = 0
+    while True:
+        attempts += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(init)
+        except Exception as e:
+            _status[name] = {"ready": False, "error": str(e), "attempts": attempts}
+            logger.error(f"Startup: {name} failed (attempt {attempts}), retrying in {STARTUP_RETRY_SECONDS:g}s: {e}")
+            await asyncio.sleep(STARTUP_RETRY_SECONDS)
+            continue
+        seconds = round(time.perf_counter() - started, 3)
+        _status[name] = {"ready": True, "seconds": seconds, "attempts": attempts}
+        logger.info(f"Startup: {name} ready in {seconds:.2f}s")
+        return
+
+async def initialize() -> None:
+    """Bring up the database schema, Qdrant and the models concurrently, with warmup encodes.
+
+    A dependency that fails is retried every STARTUP_RETRY_SECONDS instead
+    of crashing the process; readiness() reports it as not ready
+    meanwhile. Returns once everything is ready and logs a per-component
+    timing breakdown.
+    """
+    started = time.perf_counter()
+    components = _components()
+    for name in components:
+        _status.setdefault(name, {"ready": False, "attempts": 0})
+    await asyncio.gather(*(_start(name, init) for name, init in components.items()))
+    breakdown = ", ".join(f"{name} {_status[name]['seconds']:.2f}s" for name in components)
+    logger.info(f"Startup completed in {time.perf_counter() - started:.2f}s ({breakdown})")
+
+def readiness() -> Dict[str, Any]:
+    """Whether every dependency is initialized, with the state of each."""
+    components = {name: dict(status) for name, status in _status.items()}
+    return {
+        "ready": bool(components) and all(status["ready"] for status in components.values()),
+        "components": components
+    }
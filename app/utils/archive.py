@@ -0,0 +1,172 @@
+import glob
+import gzip
+import hashlib
+import io
+import logging
+import os
+import re
+import zlib
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.utils.crawler import CrawledPage
+
+load_dotenv()
+
+# Directory holding one compressed crawl archive per scraping job
+CRAWL_ARCHIVE_DIR = os.getenv("CRAWL_ARCHIVE_DIR", "data/crawl_archives")
+
+ARCHIVE_SUFFIX = ".warc.gz"
+
+# Bytes of compressed archive read at a time
+ARCHIVE_READ_CHUNK = 64 * 1024
+
+# Record types: a fetched page, or a page that disappeared from the site (404/410)
+RECORD_RESPONSE = "response"
+RECORD_GONE = "gone"
+
+# Collection names used as directory names as they are; anything else is keyed by its hash
+SAFE_NAME_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,199}")
+
+def collection_archive_dir(collection_name: str) -> str:
+    """Directory holding a collection's archives, always inside CRAWL_ARCHIVE_DIR.
+
+    Names that could escape it (separators, '..', absolute paths) are
+    replaced by a hash of the name. Raises ValueError if the result still
+    resolves outside CRAWL_ARCHIVE_DIR.
+    """
+    if SAFE_NAME_PATTERN.fullmatch(collection_name):
+        name = collection_name
+    else:
+        name = "h-" + hashlib.sha256(collection_name.encode("utf-8")).hexdigest()[:32]
+    root = os.path.realpath(CRAWL_ARCHIVE_DIR)
+    directory = os.path.realpath(os.path.join(root, name))
+    if os.path.dirname(directory) != root:
+        raise ValueError(f"Archive directory for collection {collection_name!r} is outside {CRAWL_ARCHIVE_DIR}")
+    return directory
+
+def archive_path(collection_name: str, job_id: str) -> str:
+    """Path of the crawl archive for a job."""
+    if not SAFE_NAME_PATTERN.fullmatch(job_id):
+        raise ValueError(f"Invalid job id for a crawl archive: {job_id!r}")
+    return os.path.join(collection_archive_dir(collection_name), f"{job_id}{ARCHIVE_SUFFIX}")
+
+def list_archives(collection_name: str) -> List[str]:
+    """Crawl archives of a collection, newest first."""
+    paths = glob.glob(os.path.join(glob.escape(collection_archive_dir(collection_name)), f"*{ARCHIVE_SUFFIX}"))
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+class CrawlArchiveWriter:
+    """Append-only, WARC-like archive of crawled pages.
+
+    Each record is written as its own gzip member (header lines, a blank
+    line, then the body), so the file can be appended to as pages arrive
+    and read back as a stream without loading it whole.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "ab")
+
+    def write(self, page: CrawledPage) -> None:
+        body = (page.html or "").encode("utf-8")
+        headers = {
+            "WARC-Type": RECORD_RESPONSE if page.html is not None else RECORD_GONE,
+            "WARC-Target-URI": page.url,
+            "WARC-Date": datetime.utcnow().isoformat() + "Z",
+            "HTTP-Status": str(page.status),
+            "ETag": page.etag or "",
+            "Last-Modified": page.last_modified or "",
+            "Content-Length": str(len(body))
+        }
+        header_block = "".join(f"{key}: {value}\r\n" for key, value in headers.items())
+        record = header_block.encode("utf-8") + b"\r\n" + body + b"\r\n\r\n"
+        self._file.write(gzip.compress(record, compresslevel=6))
+        # A crash then loses at most the record being written, which readers drop as a truncated tail
+        self._file.flush()
+        self.records += 1
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+            logging.info(f"Wrote {self.records} records to crawl archive {self.path}")
+
+    def __enter__(self) -> "CrawlArchiveWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def _read_headers(stream: io.BufferedIOBase) -> Optional[dict]:
+    headers = {}
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.rstrip(b"\r\n")
+        if not line:
+            return headers
+        key, _, value = line.decode("utf-8").partition(": ")
+        headers[key] = value
+
+def _archive_members(path: str) -> Iterator[Tuple[bytes, int]]:
+    """Decompressed gzip members of an archive, each with the file offset where it ends.
+
+    Stops at the last complete member: a tail cut short by an interrupted
+    write (or otherwise corrupt) is logged and skipped.
+    """
+    with open(path, "rb") as f:
+        position = 0  # compressed bytes consumed
+        end = 0  # end of the last complete member
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        parts: List[bytes] = []
+        while True:
+            chunk = f.read(ARCHIVE_READ_CHUNK)
+            if not chunk:
+                break
+            while chunk:
+                try:
+                    parts.append(decompressor.decompress(chunk))
+                except zlib.error as e:
+                    logging.warning(f"Crawl archive {path} is corrupt after byte {end}, ignoring the rest: {e}")
+                    return
+                if not decompressor.eof:
+                    position += len(chunk)
+                    break
+                position += len(chunk) - len(decompressor.unused_data)
+                end = position
+                yield b"".join(parts), end
+                chunk = decompressor.unused_data
+                decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                parts = []
+        if position > end:
+            logging.warning(f"Crawl archive {path} ends with a truncated record after byte {end}, ignoring it")
+
+def read_archive_records(path: str) -> Iterator[Tuple[CrawledPage, int]]:
+    """Stream the pages stored in a crawl archive with the file offset where each record ends.
+
+    The offset of the last page is where the complete part of the archive
+    ends; a truncated last record is not yielded.
+    """
+    for record, end in _archive_members(path):
+        stream = io.BytesIO(record)
+        headers = _read_headers(stream)
+        if headers is None:
+            continue
+        body = stream.read(int(headers.get("Content-Length", "0")))
+        yield CrawledPage(
+            url=headers["WARC-Target-URI"],
+            html=body.decode("utf-8") if headers.get("WARC-Type") == RECORD_RESPONSE else None,
+            status=int(headers.get("HTTP-Status", "200")),
+            etag=headers.get("ETag") or None,
+            last_modified=headers.get("Last-Modified") or None
+        ), end
+
+def read_archive(path: str) -> Iterator[CrawledPage]:
+    """Stream the pages stored in a crawl archive, in crawl order, up to the last complete record."""
+    for page, _ in read_archive_records(path):
+        yield page
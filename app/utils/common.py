@@ -1,14 +1,30 @@
+import asyncio
 import re
 import requests
-from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
+from bs4 import MarkupResemblesLocatorWarning
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from urllib.parse import urljoin, urlparse
+import os
 import warnings
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 import logging
 from typing import Dict, List
 
+from app.utils.extract import extract_page
+from app.utils.normalize import normalize_text
+
 warnings.filterwarnings("ignore", category=MarkupResemblesLocatorWarning)
 
+# Query parameters that never change page content; '*' marks a prefix
+STRIP_QUERY_PARAMS = [
+    p.strip().lower()
+    for p in os.getenv(
+        "CRAWL_STRIP_QUERY_PARAMS",
+        "utm_*,gclid,fbclid,msclkid,mc_cid,mc_eid,_ga,_gl,ref,sessionid,phpsessid"
+    ).split(",")
+    if p.strip()
+]
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
 def scrape_url(url: str) -> str:
     """Scrape content from a single URL."""
     try:
@@ -25,82 +41,53 @@ def scrape_url(url: str) -> str:
 def clean_text(html: str) -> str:
     """Clean HTML and extract meaningful text."""
     try:
-        soup = BeautifulSoup(html, "html.parser")
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Extract text from meaningful tags
-        texts = soup.find_all(["p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "div", "span"])
-        clean_texts = []
-        
-        for element in texts:
-            text = element.get_text(strip=True)
-            if text and len(text) > 10:  # Filter out very short texts
-                clean_texts.append(text)
-        
-        return "\n".join(clean_texts)
+        return "\n".join(extract_page(html).blocks)
     except Exception as e:
         logging.error(f"Failed to clean text: {e}")
         return ""
 
 def crawl_website(start_url: str, max_pages: int = None) -> Dict[str, str]:
-    """Crawl a website starting from the given URL. If max_pages is None, crawl all pages."""
-    visited = set()
-    data = {}
-    urls_to_visit = [start_url]
-    
-    while urls_to_visit:
-        # If max_pages is set and we've reached the limit, stop
-        if max_pages is not None and len(visited) >= max_pages:
-            break
-            
-        current_url = urls_to_visit.pop(0)
-        
-        if current_url in visited:
-            continue
-            
-        try:
-            logging.info(f"Crawling: {current_url} (Total crawled: {len(visited)})")
-            html = scrape_url(current_url)
-            
-            if not html:
-                continue
-                
-            # Check if it's HTML content
-            try:
-                response_check = requests.head(current_url, timeout=5)
-                content_type = response_check.headers.get("Content-Type", "")
-                if "text/html" not in content_type:
-                    continue
-            except:
-                # If head request fails, assume it's HTML and continue
-                pass
-                
-            visited.add(current_url)
-            data[current_url] = html
-            
-            # Extract links for further crawling
-            soup = BeautifulSoup(html, "html.parser")
-            for link in soup.find_all("a", href=True):
-                full_url = urljoin(current_url, link["href"])
-                
-                # Only crawl links from the same domain
-                if (urlparse(full_url).netloc == urlparse(start_url).netloc 
-                    and full_url not in visited 
-                    and full_url not in urls_to_visit):
-                    
-                    # Skip certain file types and fragments
-                    if not should_skip_url(full_url):
-                        urls_to_visit.append(full_url)
-                    
-        except Exception as e:
-            logging.error(f"Error crawling {current_url}: {e}")
-            continue
-    
-    logging.info(f"Crawling completed. Total pages crawled: {len(data)}")
-    return data
+    """Crawl a website starting from the given URL. If max_pages is None, crawl all pages.
+
+    Synchronous wrapper around app.utils.crawler.crawl_website_async for callers
+    without a running event loop.
+    """
+    from app.utils.crawler import crawl_website_async
+    return asyncio.run(crawl_website_async(start_url, max_pages=max_pages))
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so trivially different spellings of a page dedupe to one key.
+
+    Lowercases scheme and host, drops default ports, fragments and tracking
+    query parameters (CRAWL_STRIP_QUERY_PARAMS, '*' suffix for prefixes),
+    sorts the remaining parameters and removes trailing slashes from
+    non-root paths.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path) or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/") or "/"
+
+    query = urlencode(sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_stripped_param(key)
+    ))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+def _is_stripped_param(key: str) -> bool:
+    key = key.lower()
+    for pattern in STRIP_QUERY_PARAMS:
+        if pattern.endswith("*") and key.startswith(pattern[:-1]):
+            return True
+        if key == pattern:
+            return True
+    return False
 
 def should_skip_url(url: str) -> bool:
     """Check if URL should be skipped based on file extension or other criteria."""
@@ -123,17 +110,18 @@ def should_skip_url(url: str) -> bool:
 
 
 def preprocess_text(text: str) -> str:
-    """Preprocess text to ensure it's clean and properly formatted."""
-    # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text)
-    # Remove special characters but keep basic punctuation
-    text = re.sub(r'[^\w\s.,!?-]', '', text)
-    # Ensure proper spacing around punctuation
-    text = re.sub(r'\s+([.,!?])', r'\1', text)
-    return text.strip()
+    """Preprocess text to ensure it's clean and properly formatted.
+
+    See app.utils.normalize.normalize_text; emails, URLs and phone numbers
+    are kept intact (TEXT_PRESERVE).
+    """
+    return normalize_text(text)
 
 def create_chunks(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
-    """Create overlapping chunks from text with fixed size."""
+    """Create overlapping chunks from text with a fixed size in characters.
+
+    Ingestion uses the token-aware chunker in app.services.chunking instead.
+    """
     if not text:
         return []
     
@@ -156,17 +144,14 @@ def create_chunks(text: str, chunk_size: int = 1000, overlap: int = 200) -> List
             if chunk_text.strip():
                 chunks.append(chunk_text)
             
-            # Start new chunk with overlap
-            overlap_sentences = []
+            # Start new chunk with overlap: walk back to the first sentence that still fits
+            start = len(current_chunk)
             overlap_size = 0
-            for s in reversed(current_chunk):
-                if overlap_size + len(s) <= overlap:
-                    overlap_sentences.insert(0, s)
-                    overlap_size += len(s)
-                else:
-                    break
+            while start > 0 and overlap_size + len(current_chunk[start - 1]) <= overlap:
+                start -= 1
+                overlap_size += len(current_chunk[start])
             
-            current_chunk = overlap_sentences
+            current_chunk = current_chunk[start:]
             current_size = overlap_size
         
         current_chunk.append(sentence)
@@ -178,4 +163,10 @@ def create_chunks(text: str, chunk_size: int = 1000, overlap: int = 200) -> List
         if chunk_text.strip():
             chunks.append(chunk_text)
     
-    return chunks
\ No newline at end of file
+    return chunks
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the LLM token count of a text (roughly 4 characters per token)."""
+    if not text:
+        return 0
+    return max(1, (len(text) + 3) // 4)
@@ -0,0 +1,304 @@
+import asyncio
+import gzip
+import logging
+import os
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import httpx
+from dotenv import load_dotenv
+
+from app.utils.common import canonicalize_url, should_skip_url
+from app.utils.extract import extract_page
+
+load_dotenv()
+
+# Total number of pooled keep-alive connections / concurrent fetches
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "16"))
+# Maximum concurrent requests to a single host
+CRAWL_PER_HOST_LIMIT = int(os.getenv("CRAWL_PER_HOST_LIMIT", "4"))
+# Per-request timeout in seconds
+CRAWL_TIMEOUT = float(os.getenv("CRAWL_TIMEOUT", "10"))
+# Honor robots.txt disallow rules and crawl-delay
+CRAWL_RESPECT_ROBOTS = os.getenv("CRAWL_RESPECT_ROBOTS", "true").lower() == "true"
+# Seed the frontier from sitemap.xml (and sitemaps listed in robots.txt)
+CRAWL_USE_SITEMAPS = os.getenv("CRAWL_USE_SITEMAPS", "true").lower() == "true"
+# Upper bound on sitemap documents fetched per crawl (sitemap indexes can nest)
+CRAWL_MAX_SITEMAPS = int(os.getenv("CRAWL_MAX_SITEMAPS", "50"))
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+HEADERS = {
+    'User-Agent': USER_AGENT
+}
+
+ProgressCallback = Callable[[int, int], None]
+
+# Stored (ETag, Last-Modified) pair used for conditional requests
+Validators = Tuple[Optional[str], Optional[str]]
+
+class CrawledPage(NamedTuple):
+    """A fetched page. html is None for 304 Not Modified and 404/410 Gone responses.
+
+    text holds the extracted block text when the crawler already parsed the page.
+    url is the canonical URL the page was requested as (the dedupe key); final_url is
+    the URL the response came from after redirects, which relative links resolve against.
+    """
+    url: str
+    html: Optional[str]
+    status: int
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    text: Optional[str] = None
+    final_url: Optional[str] = None
+
+async def fetch_robots(client: httpx.AsyncClient, start_url: str) -> Optional[RobotFileParser]:
+    """Fetch and parse robots.txt for the start URL's host. Returns None if unavailable."""
+    parsed = urlparse(start_url)
+    robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+    try:
+        response = await client.get(robots_url)
+        if response.status_code >= 400:
+            return None
+        robots = RobotFileParser(robots_url)
+        robots.parse(response.text.splitlines())
+        return robots
+    except Exception as e:
+        logging.warning(f"Could not read robots.txt at {robots_url}: {e}")
+        return None
+
+def parse_sitemap(content: bytes) -> Tuple[List[str], List[str]]:
+    """Parse a sitemap or sitemap index. Returns (page URLs, nested sitemap URLs)."""
+    if content[:2] == b"\x1f\x8b":
+        content = gzip.decompress(content)
+    root = ET.fromstring(content)
+    locs = [
+        elem.text.strip()
+        for elem in root.iter()
+        if elem.tag.rsplit("}", 1)[-1] == "loc" and elem.text
+    ]
+    if root.tag.rsplit("}", 1)[-1] == "sitemapindex":
+        return [], locs
+    return locs, []
+
+async def fetch_sitemap_urls(client: httpx.AsyncClient, sitemap_urls: List[str]) -> List[str]:
+    """Collect page URLs from sitemaps, following sitemap indexes breadth-first."""
+    pending: Deque[str] = deque(sitemap_urls)
+    visited: Set[str] = set()
+    pages: List[str] = []
+    while pending and len(visited) < CRAWL_MAX_SITEMAPS:
+        sitemap_url = pending.popleft()
+        if sitemap_url in visited:
+            continue
+        visited.add(sitemap_url)
+        try:
+            response = await client.get(sitemap_url)
+            if response.status_code >= 400:
+                continue
+            page_urls, nested = await asyncio.to_thread(parse_sitemap, response.content)
+            pages.extend(page_urls)
+            pending.extend(nested)
+        except Exception as e:
+            logging.warning(f"Could not read sitemap {sitemap_url}: {e}")
+    logging.info(f"Found {len(pages)} URLs in {len(visited)} sitemap(s)")
+    return pages
+
+async def crawl_pages(
+    start_url: str,
+    max_pages: Optional[int] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    validators: Optional[Dict[str, Validators]] = None,
+    seed_urls: Optional[List[str]] = None,
+    seen_urls: Optional[Iterable[str]] = None
+) -> AsyncIterator[CrawledPage]:
+    """Crawl a website concurrently and yield pages as they are fetched.
+
+    Pages are fetched over a pooled keep-alive HTTP client, with at most
+    CRAWL_PER_HOST_LIMIT requests in flight per host. URLs are canonicalized
+    before dedupe, the frontier is seeded from seed_urls and the site's
+    sitemaps, and robots.txt disallow rules and crawl-delay are honored.
+    Only same-domain HTML pages are yielded; the content type comes from
+    the GET response.
+
+    validators maps URLs to a stored (ETag, Last-Modified) pair. Those URLs
+    are fetched with If-None-Match / If-Modified-Since, and unchanged pages
+    are yielded with status 304 and no HTML. Pages that are gone (404/410)
+    are yielded with no HTML so callers can drop them. max_pages bounds the
+    number of requests that produce a page; None means no limit.
+    seen_urls are treated as already fetched (e.g. when resuming a crawl).
+    on_progress, if given, is called with (pages fetched, URLs queued)
+    after every page.
+    """
+    validators = validators or {}
+    start_url = canonicalize_url(start_url)
+    start_netloc = urlparse(start_url).netloc
+    frontier: Deque[str] = deque()
+    seen: Set[str] = {canonicalize_url(url) for url in seen_urls or ()}
+    results: "asyncio.Queue[Optional[CrawledPage]]" = asyncio.Queue(maxsize=CRAWL_CONCURRENCY * 2)
+    host_limits: Dict[str, asyncio.Semaphore] = {}
+    host_next_fetch: Dict[str, float] = {}
+    robots: Optional[RobotFileParser] = None
+    crawl_delay = 0.0
+    in_flight = 0
+    reserved = 0
+    fetched = 0
+    changed = asyncio.Condition()
+
+    def enqueue(link: str) -> None:
+        try:
+            link = canonicalize_url(link)
+        except ValueError as e:
+            # Malformed links (e.g. a non-numeric or out-of-range port) are skipped, not fatal to the crawl
+            logging.debug(f"Skipping malformed link {link!r}: {e}")
+            return
+        if link in seen or urlparse(link).netloc != start_netloc or should_skip_url(link):
+            return
+        seen.add(link)
+        if robots and not robots.can_fetch(USER_AGENT, link):
+            logging.debug(f"Disallowed by robots.txt: {link}")
+            return
+        frontier.append(link)
+
+    async def fetch(client: httpx.AsyncClient, url: str) -> Optional[CrawledPage]:
+        headers = {}
+        etag, last_modified = validators.get(url, (None, None))
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        host = urlparse(url).netloc
+        limit = host_limits.setdefault(host, asyncio.Semaphore(1 if crawl_delay else CRAWL_PER_HOST_LIMIT))
+        async with limit:
+            if crawl_delay:
+                wait = host_next_fetch.get(host, 0.0) - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                host_next_fetch[host] = time.monotonic() + crawl_delay
+            response = await client.get(url, headers=headers)
+
+        if response.status_code in (304, 404, 410):
+            return CrawledPage(url, None, response.status_code, etag, last_modified)
+        response.raise_for_status()
+        if "text/html" not in response.headers.get("Content-Type", ""):
+            return None
+        return CrawledPage(
+            url,
+            response.text,
+            response.status_code,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            final_url=str(response.url)
+        )
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal in_flight, reserved, fetched
+        while True:
+            async with changed:
+                while True:
+                    budget_left = max_pages is None or reserved < max_pages
+                    if budget_left and frontier:
+                        break
+                    if not in_flight:
+                        # Nothing left to fetch and nothing that could add more
+                        changed.notify_all()
+                        return
+                    await changed.wait()
+                url = frontier.popleft()
+                in_flight += 1
+                reserved += 1
+
+            links: List[str] = []
+            page: Optional[CrawledPage] = None
+            try:
+                logging.info(f"Crawling: {url} (Total crawled: {fetched})")
+                page = await fetch(client, url)
+                if page:
+                    fetched += 1
+                    if page.html:
+                        # One parse yields both the page text and the links to follow. Links resolve
+                        # against the URL as served, since canonicalization strips the trailing slash
+                        # of directory URLs and would change the base
+                        extracted = await asyncio.to_thread(extract_page, page.html, page.final_url or url)
+                        links = extracted.links
+                        page = page._replace(text="\n".join(extracted.blocks))
+                    await results.put(page)
+                else:
+                    reserved -= 1
+            except Exception as e:
+                reserved -= 1
+                logging.error(f"Error crawling {url}: {e}")
+
+            async with changed:
+                if page and page.final_url:
+                    # A redirect target is not fetched again when other pages link to it
+                    seen.add(canonicalize_url(page.final_url))
+                for link in links:
+                    enqueue(link)
+                in_flight -= 1
+                changed.notify_all()
+
+            if on_progress:
+                on_progress(fetched, len(frontier))
+
+    async def run() -> None:
+        nonlocal robots, crawl_delay
+        limits = httpx.Limits(max_connections=CRAWL_CONCURRENCY, max_keepalive_connections=CRAWL_CONCURRENCY)
+        try:
+            async with httpx.AsyncClient(
+                headers=HEADERS,
+                timeout=CRAWL_TIMEOUT,
+                limits=limits,
+                follow_redirects=True
+            ) as client:
+                if CRAWL_RESPECT_ROBOTS:
+                    robots = await fetch_robots(client, start_url)
+                    if robots:
+                        crawl_delay = float(robots.crawl_delay(USER_AGENT) or 0)
+                        if crawl_delay:
+                            logging.info(f"Honoring robots.txt crawl-delay of {crawl_delay}s for {start_netloc}")
+
+                enqueue(start_url)
+                for url in seed_urls or []:
+                    enqueue(url)
+                if CRAWL_USE_SITEMAPS:
+                    parsed = urlparse(start_url)
+                    sitemaps = (robots.site_maps() if robots else None) or [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
+                    for page_url in await fetch_sitemap_urls(client, sitemaps):
+                        enqueue(page_url)
+
+                await asyncio.gather(*(worker(client) for _ in range(CRAWL_CONCURRENCY)))
+        finally:
+            await results.put(None)
+
+    crawl_task = asyncio.create_task(run())
+    try:
+        while True:
+            page = await results.get()
+            if page is None:
+                break
+            yield page
+        await crawl_task
+    finally:
+        if not crawl_task.done():
+            crawl_task.cancel()
+            try:
+                await crawl_task
+            except (asyncio.CancelledError, Exception):
+                pass
+    logging.info(f"Crawling completed. Total pages crawled: {fetched}")
+
+async def crawl_website_async(
+    start_url: str,
+    max_pages: Optional[int] = None,
+    on_progress: Optional[ProgressCallback] = None
+) -> Dict[str, str]:
+    """Crawl a website concurrently and return {url: html} for every HTML page fetched."""
+    data: Dict[str, str] = {}
+    async for page in crawl_pages(start_url, max_pages=max_pages, on_progress=on_progress):
+        if page.html:
+            data[page.url] = page.html
+    return data
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Set
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Set to 'false' to keep boilerplate and near-duplicate chunks
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+# A block seen on this many pages of one crawl is treated as boilerplate from then on
+BOILERPLATE_MIN_PAGES = int(os.getenv("BOILERPLATE_MIN_PAGES", "3"))
+# Chunks whose 64-bit SimHashes differ in at most this many bits are near-duplicates
+NEAR_DUPLICATE_DISTANCE = int(os.getenv("NEAR_DUPLICATE_DISTANCE", "3"))
+
+SIMHASH_BITS = 64
+WORD_PATTERN = re.compile(r"\w+")
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+def block_fingerprint(text: str) -> int:
+    """Exact fingerprint of a text block, insensitive to case and whitespace."""
+    return _hash64(" ".join(text.lower().split()))
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """64-bit SimHash over word shingles; similar texts get hashes a few bits apart."""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)] if words else []
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        h = _hash64(shingle)
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(SIMHASH_BITS) if weights[bit] > 0)
+
+class SimHashIndex:
+    """LSH index over SimHashes for near-duplicate lookups.
+
+    The hash is split into max_distance + 1 bands. Two hashes within
+    max_distance bits must agree exactly on at least one band, so only
+    hashes sharing a band are compared.
+    """
+
+    def __init__(self, max_distance: int = NEAR_DUPLICATE_DISTANCE):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = -(-SIMHASH_BITS // self.bands)
+        self._buckets: List[Dict[int, List[int]]] = [defaultdict(list) for _ in range(self.bands)]
+
+    def _band_keys(self, h: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(h >> (i * self.band_bits)) & mask for i in range(self.bands)]
+
+    def contains_near(self, h: int) -> bool:
+        for band, key in enumerate(self._band_keys(h)):
+            for other in self._buckets[band].get(key, ()):
+                if bin(h ^ other).count("1") <= self.max_distance:
+                    return True
+        return False
+
+    def add(self, h: int) -> None:
+        for band, key in enumerate(self._band_keys(h)):
+            self._buckets[band][key].append(h)
+
+class ContentDeduplicator:
+    """Drops site-wide boilerplate blocks and near-duplicate chunks within one crawl.
+
+    Pages are fed through filter_page as they stream in. A block that has
+    appeared on BOILERPLATE_MIN_PAGES pages is dropped from that page on.
+    keep_chunk then rejects chunks that are near-duplicates of a chunk
+    already kept, so one copy of repeated text (e.g. a footer with contact
+    details) survives.
+    """
+
+    def __init__(self, min_pages: int = BOILERPLATE_MIN_PAGES, max_distance: int = NEAR_DUPLICATE_DISTANCE):
+        self.min_pages = min_pages
+        self.block_pages: Dict[int, int] = defaultdict(int)
+        self.chunk_index = SimHashIndex(max_distance)
+        self.blocks_removed = 0
+        self.chunks_removed = 0
+
+    def filter_page(self, text: str) -> str:
+        """Remove boilerplate blocks (one per line) from a page's extracted text."""
+        kept = []
+        seen_on_page: Set[int] = set()
+        for block in text.split("\n"):
+            if not block.strip():
+                continue
+            fingerprint = block_fingerprint(block)
+            if fingerprint not in seen_on_page:
+                seen_on_page.add(fingerprint)
+                self.block_pages[fingerprint] += 1
+            if self.block_pages[fingerprint] >= self.min_pages:
+                self.blocks_removed += 1
+                continue
+            kept.append(block)
+        return "\n".join(kept)
+
+    def keep_chunk(self, chunk: str) -> bool:
+        """Return False if the chunk nearly duplicates one already kept; otherwise remember it."""
+        h = simhash(chunk)
+        if self.chunk_index.contains_near(h):
+            self.chunks_removed += 1
+            return False
+        self.chunk_index.add(h)
+        return True
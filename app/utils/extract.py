@@ -0,0 +1,86 @@
+from typing import List, NamedTuple, Optional
+from urllib.parse import urljoin
+import logging
+
+from lxml import etree
+from lxml import html as lxml_html
+
+# Elements that start a new block of text; everything else is inline
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "body", "br", "caption", "dd", "details", "div",
+    "dl", "dt", "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4",
+    "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "summary",
+    "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul"
+}
+
+# Elements whose content is never visible text
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "head", "object", "canvas"}
+
+# Blocks this short are mostly labels and icons (same cut-off as the original clean_text)
+MIN_BLOCK_LENGTH = 10
+
+_parser = lxml_html.HTMLParser(encoding="utf-8", remove_comments=True, remove_pis=True)
+
+class ExtractedPage(NamedTuple):
+    """Visible text blocks in document order, and absolute outbound links."""
+    blocks: List[str]
+    links: List[str]
+
+def extract_page(html: str, base_url: Optional[str] = None) -> ExtractedPage:
+    """Extract block text and links from HTML in a single pass over the parsed tree.
+
+    Text is accumulated into one buffer that is flushed whenever a block
+    element starts or ends, so every piece of text is emitted exactly once
+    and in document order, however deeply blocks are nested.
+    """
+    blocks: List[str] = []
+    links: List[str] = []
+    if not html or not html.strip():
+        return ExtractedPage(blocks, links)
+
+    try:
+        root = lxml_html.document_fromstring(html.encode("utf-8", "replace"), parser=_parser)
+    except (etree.ParserError, ValueError) as e:
+        logging.warning(f"Failed to parse HTML: {e}")
+        return ExtractedPage(blocks, links)
+
+    buffer: List[str] = []
+    skip_depth = 0
+
+    def flush() -> None:
+        if buffer:
+            text = " ".join("".join(buffer).split())
+            buffer.clear()
+            if len(text) > MIN_BLOCK_LENGTH:
+                blocks.append(text)
+
+    for event, element in etree.iterwalk(root, events=("start", "end")):
+        tag = element.tag if isinstance(element.tag, str) else ""
+        if event == "start":
+            if tag in SKIP_TAGS:
+                skip_depth += 1
+                continue
+            if skip_depth:
+                continue
+            if tag == "a":
+                href = (element.get("href") or "").strip()
+                if href:
+                    try:
+                        links.append(urljoin(base_url, href) if base_url else href)
+                    except ValueError as e:
+                        # e.g. an unterminated IPv6 host; only this link is dropped
+                        logging.debug(f"Skipping malformed link {href!r}: {e}")
+            if tag in BLOCK_TAGS:
+                flush()
+            if element.text:
+                buffer.append(element.text)
+        else:
+            if tag in SKIP_TAGS:
+                skip_depth -= 1
+            elif not skip_depth and tag in BLOCK_TAGS:
+                flush()
+            if not skip_depth and element.tail:
+                buffer.append(element.tail)
+
+    flush()
+    return ExtractedPage(blocks, links)
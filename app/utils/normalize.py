@@ -0,0 +1,126 @@
+import os
+import re
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional, Pattern
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Token kinds kept verbatim by the normalizer (comma-separated: email, url, phone; empty keeps none)
+TEXT_PRESERVE = frozenset(
+    kind.strip().lower()
+    for kind in os.getenv("TEXT_PRESERVE", "email,url,phone").split(",")
+    if kind.strip()
+)
+
+# Characters removed from ordinary text: anything but word characters, whitespace and basic punctuation
+_DROP = r"[^\w\s.,!?-]"
+# Every alternative starts with a plain character test (lookbehinds come after it),
+# so the scan rejects the characters inside ordinary words cheaply
+_PRESERVED_PATTERNS = {
+    # Matched from the '@' (and any '+' in the local part), the only characters of an
+    # address the normalizer would otherwise remove; starting at every word would rescan it
+    "email": r"@(?<=[\w.-]@)[\w-]+(?:\.[\w-]+)+|\+(?<=\w\+)(?=[\w.+-]*@[\w-]+\.)",
+    # Trailing sentence punctuation is not part of the URL
+    "url": r"(?:h(?<![\w/]h)ttps?://|w(?<![\w/]w)ww\.)[^\s<>\"'()]*[^\s<>\"'().,!?;:]",
+    # Only numbers with a '+' or parentheses need protecting; plain digits, spaces, dots and dashes survive anyway
+    "phone": (
+        r"(?:\+(?<![\w+]\+)\d{1,3}(?:[ .-]?(?:\(\d{1,4}\)|\d{1,4})){2,5}"
+        r"|\((?<![\w+]\()\d{1,4}\)(?:[ .-]?\d{1,4}){2,4})(?!\w)"
+    ),
+}
+# What a kind cannot occur without; kinds whose trigger is absent from a text are left out of its pattern
+_TRIGGERS = {kind: re.compile(trigger) for kind, trigger in (("email", "@"), ("url", r"://|www\."), ("phone", r"[+(]\d"))}
+_PUNCTUATION = ".,!?"
+_KEPT_PUNCTUATION = "_.,!?-"
+
+@lru_cache(maxsize=None)
+def _normalizer(preserve: frozenset) -> Pattern:
+    """One alternation matching everything the normalizer rewrites, compiled once per preserve set."""
+    unknown = preserve - _PRESERVED_PATTERNS.keys()
+    if unknown:
+        raise ValueError(f"Unknown TEXT_PRESERVE kinds: {', '.join(sorted(unknown))}")
+    alternatives = [f"(?P<{kind}>{_PRESERVED_PATTERNS[kind]})" for kind in sorted(preserve)]
+    # Runs stop before a '+' or '(' that may start a phone number; a run may still
+    # begin with one, since the phone alternative has already failed there
+    drop_more = rf"(?:{_DROP}(?!(?<=[+(])\d))" if "phone" in preserve else _DROP
+    # Whitespace runs (with any dropped characters in them), except the common single
+    # space between two words, which needs no rewriting and so never reaches Python
+    alternatives.append(rf"(?P<space>(?:{drop_more}+\s|[^\S ]| (?![\w-]))(?:\s|{drop_more})*)")
+    alternatives.append(rf"(?P<drop>{_DROP}{drop_more}*)")
+    return re.compile("|".join(alternatives))
+
+def _replace(match: re.Match) -> str:
+    kind = match.lastgroup
+    if kind == "drop":
+        return ""
+    if kind == "space":
+        # No space before punctuation
+        end = match.end()
+        return "" if end < len(match.string) and match.string[end] in _PUNCTUATION else " "
+    return match.group()
+
+def _normalize(text: str, preserve: frozenset) -> str:
+    present = frozenset(kind for kind in preserve if _TRIGGERS[kind].search(text))
+    return _normalizer(present).sub(_replace, text)
+
+def normalize_text(text: str, preserve: Optional[Iterable[str]] = None) -> str:
+    """Clean extracted text in a single regex pass.
+
+    Whitespace runs become one space, characters other than word
+    characters and basic punctuation (.,!?-) are removed and spaces before
+    punctuation are dropped. Emails, URLs and phone numbers (per preserve,
+    default TEXT_PRESERVE) are kept verbatim so actionable contact details
+    survive into the stored chunks.
+    """
+    kinds = TEXT_PRESERVE if preserve is None else frozenset(preserve)
+    _normalizer(kinds)  # validates the kinds
+    return _normalize(text, kinds).strip()
+
+def _stream_cut(text: str) -> int:
+    """Where to split text so the head ends in a kept character and the rest starts with whitespace; 0 if nowhere."""
+    end = len(text)
+    while True:
+        cut = max(text.rfind(" ", 0, end), text.rfind("\n", 0, end))
+        space = cut
+        # Back to the start of the gap, which may mix whitespace and dropped characters
+        while cut > 0 and text[cut - 1].isspace():
+            cut -= 1
+        if cut <= 0:
+            return 0
+        # Never between two digit groups, which may belong to one spaced phone number
+        in_number = text[cut - 1] in "0123456789)" and text[space + 1:space + 2] in ("", *"0123456789(")
+        if (text[cut - 1].isalnum() or text[cut - 1] in _KEPT_PUNCTUATION) and not in_number:
+            return cut
+        end = cut
+
+def normalize_stream(pieces: Iterable[str], preserve: Optional[Iterable[str]] = None) -> Iterator[str]:
+    """Normalize a stream of text pieces (e.g. blocks read from a file), yielding normalized pieces.
+
+    The last word of every piece is carried over to the next one, so a
+    token or whitespace run split across pieces is normalized as a whole;
+    the yielded pieces concatenate to normalize_text of the joined input.
+    Only one piece and its carry are held in memory at a time.
+    """
+    kinds = TEXT_PRESERVE if preserve is None else frozenset(preserve)
+    _normalizer(kinds)  # validates the kinds
+    carry = ""
+    started = False
+    for piece in pieces:
+        text = carry + piece
+        cut = _stream_cut(text)
+        if cut <= 0:
+            carry = text
+            continue
+        head, carry = text[:cut], text[cut:]
+        normalized = _normalize(head, kinds)
+        if not started:
+            normalized = normalized.lstrip()
+        if normalized:
+            started = True
+            yield normalized
+    normalized = _normalize(carry, kinds)
+    normalized = normalized.strip() if not started else normalized.rstrip()
+    if normalized:
+        yield normalized
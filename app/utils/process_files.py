@@ -1,34 +1,169 @@
-
-import io
+import codecs
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
 import traceback
 import xml.etree.ElementTree as ET
+import zipfile
+from typing import BinaryIO, Iterator, List
+
 import PyPDF2
-from fastapi import HTTPException, logger
+from dotenv import load_dotenv
+from fastapi import HTTPException
 
 from app.utils.common import preprocess_text
+from app.utils.normalize import normalize_stream
 
+load_dotenv()
 
-def process_pdf(file_content: bytes) -> str:
-    """Extract text from PDF file."""
-    try:
-        pdf_file = io.BytesIO(file_content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = {
+    'pdf': 'application/pdf',
+    'svg': 'image/svg+xml',
+    'txt': 'text/plain',
+    'doc': 'application/msword',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+}
+
+# Processes extracting the pages of one PDF
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Consecutive pages extracted by one task
+PDF_SHARD_PAGES = int(os.getenv("PDF_SHARD_PAGES", "16"))
+# Seconds one PDF may take to extract before it is abandoned; 0 disables the limit
+PDF_EXTRACT_TIMEOUT_SECONDS = float(os.getenv("PDF_EXTRACT_TIMEOUT_SECONDS", "300"))
+
+# Characters of a text file decoded and normalized at a time
+TEXT_READ_CHARS = 256 * 1024
+
+# WordprocessingML elements read by the DOCX extractor
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+WORD_BODY = f"{WORD_NAMESPACE}body"
+WORD_PARAGRAPH = f"{WORD_NAMESPACE}p"
+WORD_TEXT = f"{WORD_NAMESPACE}t"
+WORD_BREAKS = {f"{WORD_NAMESPACE}tab", f"{WORD_NAMESPACE}br", f"{WORD_NAMESPACE}cr"}
+# Characters of paragraphs handed to the chunker at a time (one paragraph per line)
+DOCX_BLOCK_CHARS = 16 * 1024
+
+def _extract_page_range(path: str, start: int, end: int) -> List[str]:
+    """Raw text of pages [start, end) of the PDF at path (runs in a pool process)."""
+    reader = PyPDF2.PdfReader(path)
+    return [reader.pages[index].extract_text() or "" for index in range(start, end)]
+
+def _pool_context():
+    # Forked workers start instantly and inherit the loaded modules; spawning
+    # would re-import the server's main module (and the embedding model)
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("fork" if "fork" in methods else None)
+
+def iter_pdf_pages(
+    file: BinaryIO,
+    workers: int = PDF_EXTRACT_WORKERS,
+    timeout: float = PDF_EXTRACT_TIMEOUT_SECONDS
+) -> Iterator[str]:
+    """Yield the preprocessed text of each non-empty page of a PDF, in page order.
+
+    The PDF is split into PDF_SHARD_PAGES-page ranges extracted in a pool
+    of worker processes, and pages are yielded as soon as their shard and
+    every earlier one are done, so chunking overlaps extraction. Raises
+    TimeoutError once extraction runs past timeout seconds and kills the
+    pool, since a pathological page cannot be interrupted otherwise; this
+    holds for short PDFs and a single worker too. Only with no timeout
+    (<= 0) and one worker are pages extracted in the calling thread.
+    """
+    deadline = time.monotonic() + timeout
+    reader = PyPDF2.PdfReader(file)
+    page_count = len(reader.pages)
+
+    if timeout <= 0 and (workers <= 1 or page_count <= PDF_SHARD_PAGES):
+        for page in reader.pages:
             page_text = page.extract_text()
             if page_text:
-                text += preprocess_text(page_text) + "\n"
-        return text
-    except Exception as e:
-        logger.error(f"Error processing PDF: {str(e)}")
-        logger.error(traceback.format_exc())
-        raise HTTPException(status_code=400, detail=f"Error processing PDF file: {str(e)}")
+                yield preprocess_text(page_text)
+        return
+
+    # Workers open the PDF by path, so spill the upload to a named file
+    file.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as spill:
+        shutil.copyfileobj(file, spill)
+    shards = [(start, min(start + PDF_SHARD_PAGES, page_count)) for start in range(0, page_count, PDF_SHARD_PAGES)]
+    pool = _pool_context().Pool(processes=max(1, min(workers, len(shards))))
+    try:
+        results = [pool.apply_async(_extract_page_range, (spill.name, start, end)) for start, end in shards]
+        for result in results:
+            try:
+                page_texts = result.get(timeout=max(deadline - time.monotonic(), 0) if timeout > 0 else None)
+            except multiprocessing.TimeoutError:
+                raise TimeoutError(f"PDF extraction exceeded {timeout:g}s")
+            for page_text in page_texts:
+                if page_text:
+                    yield preprocess_text(page_text)
+    finally:
+        # Kills a process stuck on a page as well as idle ones
+        pool.terminate()
+        os.unlink(spill.name)
+
+def _paragraph_text(paragraph: ET.Element) -> str:
+    return "".join(
+        element.text or "" if element.tag == WORD_TEXT else " "
+        for element in paragraph.iter()
+        if element.tag == WORD_TEXT or element.tag in WORD_BREAKS
+    )
+
+def iter_docx_paragraphs(file: BinaryIO) -> Iterator[str]:
+    """Yield the text of each non-empty paragraph of a DOCX file, in document order.
+
+    word/document.xml is parsed incrementally straight from the zip
+    container: every paragraph is cleared once its text is read, and every
+    finished top-level block (paragraph, table) is dropped from the body,
+    so only the block being parsed is held in memory. Table cells come out
+    as their own paragraphs; deleted tracked-change text is left out.
+    """
+    with zipfile.ZipFile(file) as container:
+        with container.open("word/document.xml") as document:
+            body = None
+            depth = 0
+            for event, element in ET.iterparse(document, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if element.tag == WORD_BODY:
+                        body = element
+                    continue
+                depth -= 1
+                if element.tag == WORD_PARAGRAPH:
+                    text = _paragraph_text(element)
+                    # Nested paragraphs (text boxes) are read and cleared before their parent
+                    element.clear()
+                    if text.strip():
+                        yield text
+                if body is not None and depth == 2:
+                    # A child of w:body (w:document > w:body > block) is complete
+                    body.clear()
+
+def iter_docx_blocks(file: BinaryIO) -> Iterator[str]:
+    """Yield preprocessed DOCX paragraphs joined into blocks of about DOCX_BLOCK_CHARS, one paragraph per line."""
+    block: List[str] = []
+    size = 0
+    for paragraph in iter_docx_paragraphs(file):
+        text = preprocess_text(paragraph)
+        if not text:
+            continue
+        block.append(text)
+        size += len(text) + 1
+        if size >= DOCX_BLOCK_CHARS:
+            yield "\n".join(block)
+            block = []
+            size = 0
+    if block:
+        yield "\n".join(block)
 
-def process_svg(file_content: bytes) -> str:
-    """Extract text from SVG file."""
+def process_svg(file: BinaryIO) -> str:
+    """Extract text from an SVG file object."""
     try:
-        svg_content = file_content.decode('utf-8')
-        root = ET.fromstring(svg_content)
+        root = ET.parse(file).getroot()
         # Extract text elements from SVG
         text_elements = root.findall(".//{http://www.w3.org/2000/svg}text")
         text = "\n".join([elem.text for elem in text_elements if elem.text])
@@ -38,12 +173,25 @@ def process_svg(file_content: bytes) -> str:
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=400, detail=f"Error processing SVG file: {str(e)}")
 
-def process_text_file(file_content: bytes) -> str:
-    """Process text-based files."""
-    try:
-        text = file_content.decode('utf-8')
-        return preprocess_text(text)
-    except Exception as e:
-        logger.error(f"Error processing text file: {str(e)}")
-        logger.error(traceback.format_exc())
-        raise HTTPException(status_code=400, detail=f"Error processing text file: {str(e)}")
\ No newline at end of file
+def iter_text_file(file: BinaryIO) -> Iterator[str]:
+    """Yield a UTF-8 text file's normalized text in pieces of about TEXT_READ_CHARS characters."""
+    reader = codecs.getreader('utf-8')(file)
+    return normalize_stream(iter(lambda: reader.read(TEXT_READ_CHARS), ""))
+
+def iter_document_text(file: BinaryIO, file_extension: str) -> Iterator[str]:
+    """Text of an uploaded document in pieces for the chunker.
+
+    PDFs stream one page, DOCX files one block of paragraphs and text
+    files one TEXT_READ_CHARS block at a time; SVGs are extracted whole.
+    """
+    if file_extension == 'pdf':
+        return iter_pdf_pages(file)
+    if file_extension in ('docx', 'doc'):
+        # A .doc is often a renamed DOCX; legacy binary Word files cannot be read
+        if not zipfile.is_zipfile(file):
+            raise HTTPException(status_code=400, detail="Legacy binary .doc files are not supported; save the document as .docx")
+        file.seek(0)
+        return iter_docx_blocks(file)
+    if file_extension == 'svg':
+        return iter([process_svg(file)])
+    return iter_text_file(file)
@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import time
+from typing import BinaryIO, List, NamedTuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, UploadFile
+
+load_dotenv()
+
+# Largest accepted upload, in megabytes
+UPLOAD_MAX_MB = float(os.getenv("UPLOAD_MAX_MB", "100"))
+UPLOAD_MAX_BYTES = int(UPLOAD_MAX_MB * 1024 * 1024)
+# Largest accepted bulk upload request (all files or the zip archive together), in megabytes
+BULK_UPLOAD_MAX_MB = float(os.getenv("BULK_UPLOAD_MAX_MB", "1024"))
+BULK_UPLOAD_MAX_BYTES = int(BULK_UPLOAD_MAX_MB * 1024 * 1024)
+# Directory where bulk uploads wait for a worker; must be shared by the API and the workers
+UPLOAD_STAGING_DIR = os.getenv("UPLOAD_STAGING_DIR", "data/uploads")
+# Bytes read from an upload at a time while it is hashed and measured
+UPLOAD_READ_CHUNK_BYTES = 1024 * 1024
+# Allowance for multipart boundaries and form fields when checking Content-Length
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+class TooLarge(ValueError):
+    """Raised when copied content exceeds its size limit."""
+
+class SpooledUpload(NamedTuple):
+    file: BinaryIO
+    size: int
+    sha256: str
+
+class StagedUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+async def spool_upload(upload: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> SpooledUpload:
+    """Hash and measure an upload chunk by chunk, rejecting it past max_bytes.
+
+    The multipart parser has already spooled the file to a temporary file
+    (in memory up to 1 MB, on disk beyond), so it is never held in memory
+    as a whole. The returned file is rewound for the extractors, which
+    read from it directly.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = await upload.read(UPLOAD_READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"File exceeds the {UPLOAD_MAX_MB:g} MB upload limit")
+        digest.update(chunk)
+    await upload.seek(0)
+    return SpooledUpload(upload.file, size, digest.hexdigest())
+
+def staging_dir(job_id: str) -> str:
+    """Directory holding the staged files of a bulk upload job."""
+    return os.path.join(UPLOAD_STAGING_DIR, job_id)
+
+def remove_staged_files(job_id: str) -> None:
+    shutil.rmtree(staging_dir(job_id), ignore_errors=True)
+
+def list_staged_jobs(min_age_seconds: float) -> List[str]:
+    """Job ids with staged files untouched for at least min_age_seconds."""
+    if not os.path.isdir(UPLOAD_STAGING_DIR):
+        return []
+    cutoff = time.time() - min_age_seconds
+    return [
+        entry.name for entry in os.scandir(UPLOAD_STAGING_DIR)
+        if entry.is_dir() and entry.stat().st_mtime < cutoff
+    ]
+
+async def save_upload(upload: UploadFile, path: str, max_bytes: int) -> StagedUpload:
+    """Copy an upload to path chunk by chunk, hashing it and rejecting it past max_bytes."""
+    digest = hashlib.sha256()
+    size = 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as out:
+        while True:
+            chunk = await upload.read(UPLOAD_READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"{upload.filename} exceeds the {max_bytes / 1024 / 1024:g} MB upload limit")
+            digest.update(chunk)
+            await asyncio.to_thread(out.write, chunk)
+    return StagedUpload(path, size, digest.hexdigest())
+
+def copy_hashed(source: BinaryIO, target: BinaryIO, max_bytes: int) -> SpooledUpload:
+    """Copy a stream (e.g. a zip member) chunk by chunk, hashing it; raises TooLarge past max_bytes.
+
+    The size is counted from the bytes actually read, so an archive member
+    that understates its size in the zip directory is still caught. The
+    target is rewound.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = source.read(UPLOAD_READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise TooLarge(f"exceeds the {max_bytes / 1024 / 1024:g} MB file limit")
+        digest.update(chunk)
+        target.write(chunk)
+    target.seek(0)
+    return SpooledUpload(target, size, digest.hexdigest())
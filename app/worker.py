@@ -0,0 +1,226 @@
+"""Ingestion worker: runs queued scraping / re-ingest jobs outside the API process.
+
+Usage: python -m app.worker
+
+Start as many worker processes as needed; each runs up to WORKER_CONCURRENCY
+jobs at a time and claims jobs from the shared MySQL queue.
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+import sys
+import uuid
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+from app.db.jobs import (
+    FINISHED_STATUSES, JOB_BULK_UPLOAD, JOB_REINGEST, JOB_SCRAPE, STATUS_COMPLETED, STATUS_ERROR, JobEvent,
+    claim_job, get_job, finish_job, heartbeat_jobs, purge_finished_jobs,
+    requeue_job, requeue_stale_jobs, save_checkpoint
+)
+from app.services.bulk_upload import ingest_staged_files
+from app.services.ingest import crawl_and_ingest, reingest_from_archives
+from app.services.ingest_scheduler import scheduler_stats
+from app.services.job_progress import JobProgress
+from app.services.recrawl import RECRAWL_INTERVAL_HOURS, run_recrawl_scheduler
+from app.services.startup import initialize
+from app.utils.uploads import list_staged_jobs, remove_staged_files
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# Jobs run concurrently by one worker process
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+# Jobs of one tenant (the chatbot owner) running at the same time across all workers
+JOB_TENANT_MAX_RUNNING = int(os.getenv("JOB_TENANT_MAX_RUNNING", "2"))
+# Seconds between queue polls when the worker is idle
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+# Seconds between heartbeats, which also publish job progress events
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "1"))
+# A running job without a heartbeat for this long is considered abandoned and requeued
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "120"))
+# Attempts before an abandoned job is marked as failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Hours finished jobs are kept before they are deleted
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "72"))
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# Live progress of the jobs this worker is running, flushed by the heartbeat
+running: Dict[str, JobProgress] = {}
+
+async def run_job(job: dict) -> None:
+    job_id = job['id']
+    params = job.get('params') or {}
+    tracker = running[job_id] = JobProgress(max_pages=params.get('max_pages'))
+    progress = tracker.update
+
+    try:
+        if job['job_type'] == JOB_SCRAPE:
+            incremental = bool(params.get('incremental'))
+            # The crawl archive written so far is the checkpoint an interrupted crawl resumes from
+            resume = (job.get('checkpoint') or {}).get('stage') == "crawling"
+            await asyncio.to_thread(save_checkpoint, job_id, {"stage": "crawling"})
+            progress("crawling")
+            stats = await crawl_and_ingest(
+                job['collection_name'],
+                job['url'],
+                max_pages=params.get('max_pages'),  # None means unlimited
+                incremental=incremental,
+                progress=progress,
+                job_id=job_id,  # spill fetched HTML to this job's crawl archive
+                resume=resume,
+                tenant=job.get('tenant_id')
+            )
+            if not stats.get("pages_scraped"):
+                raise ValueError("No pages could be scraped from the provided URL")
+            if not incremental and not stats.get("chunks_created"):
+                raise ValueError("No valid text content found to ingest from the website")
+        elif job['job_type'] == JOB_REINGEST:
+            # Re-ingesting is idempotent (deterministic point ids), so a retry starts over
+            await asyncio.to_thread(save_checkpoint, job_id, {"stage": "reingesting"})
+            progress("processing")
+            stats = await reingest_from_archives(job['collection_name'], progress=progress, tenant=job.get('tenant_id'))
+        elif job['job_type'] == JOB_BULK_UPLOAD:
+            # Files already ingested are recorded with their hash, so a retry skips them as unchanged
+            await asyncio.to_thread(save_checkpoint, job_id, {"stage": "processing"})
+            progress("processing")
+            stats = await asyncio.to_thread(
+                ingest_staged_files, job['collection_name'], params.get('files', []), job.get('tenant_id'), progress
+            )
+        else:
+            raise ValueError(f"Unknown job type: {job['job_type']}")
+
+        await flush_progress(job_id)
+        await asyncio.to_thread(
+            finish_job, job_id, STATUS_COMPLETED,
+            result={"collection_name": job['collection_name'], **stats}
+        )
+        logger.info(f"Job {job_id} completed: {stats}")
+        if job['job_type'] == JOB_BULK_UPLOAD:
+            await asyncio.to_thread(remove_staged_files, job_id)
+
+    except asyncio.CancelledError:
+        # Shutting down: hand the job back so another worker resumes it
+        running.pop(job_id, None)
+        await asyncio.to_thread(requeue_job, job_id)
+        raise
+    except Exception as e:
+        await flush_progress(job_id)
+        logger.error(f"Job {job_id} failed: {e}")
+        await asyncio.to_thread(finish_job, job_id, STATUS_ERROR, error=str(e))
+        if job['job_type'] == JOB_BULK_UPLOAD:
+            await asyncio.to_thread(remove_staged_files, job_id)
+
+def _drain(job_ids) -> None:
+    progress: Dict[str, dict] = {}
+    events: List[JobEvent] = []
+    for job_id in job_ids:
+        tracker = running.get(job_id)
+        if tracker is None:
+            continue
+        snapshot, job_events = tracker.drain()
+        progress[job_id] = {
+            "status": snapshot["status"],
+            "counters": {**snapshot["counters"], "stages_seen": snapshot["stages_seen"]}
+        }
+        events += [(job_id, event_type, data) for event_type, data in job_events]
+    heartbeat_jobs(WORKER_ID, progress, events)
+
+async def flush_progress(job_id: str) -> None:
+    """Publish a finishing job's last stage transitions and counters, then stop tracking it."""
+    try:
+        await asyncio.to_thread(_drain, [job_id])
+    except Exception as e:
+        logger.error(f"Failed to publish final progress of job {job_id}: {e}")
+    running.pop(job_id, None)
+
+async def heartbeat_loop() -> None:
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            await asyncio.to_thread(_drain, list(running))
+        except Exception as e:
+            logger.error(f"Heartbeat failed: {e}")
+
+def purge_staged_uploads() -> int:
+    """Delete staged bulk uploads whose job finished or is gone, e.g. failed after its last attempt."""
+    removed = 0
+    # The API stages files before it queues their job, so only consider idle directories
+    for job_id in list_staged_jobs(JOB_STALE_SECONDS):
+        job = get_job(job_id)
+        if job is None or job['status'] in FINISHED_STATUSES:
+            remove_staged_files(job_id)
+            removed += 1
+    return removed
+
+async def maintenance_loop() -> None:
+    """Requeue jobs of dead workers and apply the retention policy to finished jobs."""
+    while True:
+        try:
+            stale = await asyncio.to_thread(requeue_stale_jobs, JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS)
+            if stale:
+                logger.warning(f"Requeued or failed {len(stale)} abandoned job(s): {stale}")
+            purged = await asyncio.to_thread(purge_finished_jobs, JOB_RETENTION_HOURS)
+            if purged:
+                logger.info(f"Deleted {purged} finished job(s) older than {JOB_RETENTION_HOURS}h")
+            staged = await asyncio.to_thread(purge_staged_uploads)
+            if staged:
+                logger.info(f"Deleted staged files of {staged} finished bulk upload(s)")
+            # Tenants whose embed / upsert batches are waiting for their fair share of this worker
+            for tenant, stats in scheduler_stats().items():
+                if any(queue and queue["waiting"] for queue in stats.values()):
+                    logger.info(f"Ingest scheduler backlog, tenant {tenant}: {stats}")
+        except Exception as e:
+            logger.error(f"Job maintenance failed: {e}")
+        await asyncio.sleep(max(JOB_STALE_SECONDS / 2, 10))
+
+async def main() -> None:
+    logger.info(f"Worker {WORKER_ID} starting with concurrency {WORKER_CONCURRENCY}")
+    # Stop cleanly on SIGTERM so running jobs are requeued right away
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    # Jobs are claimed only once the database, Qdrant and the models are up
+    await initialize()
+    background = [asyncio.create_task(heartbeat_loop()), asyncio.create_task(maintenance_loop())]
+    if RECRAWL_INTERVAL_HOURS > 0:
+        logger.info(f"Starting recrawl scheduler (every {RECRAWL_INTERVAL_HOURS}h)...")
+        background.append(asyncio.create_task(run_recrawl_scheduler()))
+
+    tasks = set()
+    try:
+        while True:
+            if len(tasks) >= WORKER_CONCURRENCY:
+                _, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            try:
+                job = await asyncio.to_thread(claim_job, WORKER_ID, JOB_TENANT_MAX_RUNNING)
+            except Exception as e:
+                logger.error(f"Failed to claim a job: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                tasks = {task for task in tasks if not task.done()}
+                continue
+            logger.info(f"Claimed job {job['id']} ({job['job_type']} {job['collection_name']}, attempt {job['attempts']})")
+            tasks.add(asyncio.create_task(run_job(job)))
+    finally:
+        for task in [*tasks, *background]:
+            task.cancel()
+        await asyncio.gather(*tasks, *background, return_exceptions=True)
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logger.info(f"Worker {WORKER_ID} stopped")
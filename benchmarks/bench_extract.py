@@ -0,0 +1,75 @@
+"""Benchmark single-pass HTML extraction against the original BeautifulSoup clean_text.
+
+Usage: python -m benchmarks.bench_extract [--pages 200] [--depth 6]
+"""
+import argparse
+import time
+
+from bs4 import BeautifulSoup
+
+from app.utils.extract import extract_page
+
+
+def legacy_clean_text(html: str) -> str:
+    """The original clean_text: html.parser + get_text on every p/h*/li/div/span."""
+    soup = BeautifulSoup(html, "html.parser")
+    for script in soup(["script", "style"]):
+        script.decompose()
+    texts = soup.find_all(["p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "div", "span"])
+    clean_texts = []
+    for element in texts:
+        text = element.get_text(strip=True)
+        if text and len(text) > 10:
+            clean_texts.append(text)
+    return "\n".join(clean_texts)
+
+def legacy_extract_links(html: str) -> list:
+    """The original second parse the crawler did to find links."""
+    soup = BeautifulSoup(html, "html.parser")
+    return [link["href"] for link in soup.find_all("a", href=True)]
+
+def legacy_crawl_parse(html: str) -> int:
+    """What the crawler and ingest did per page before: two full html.parser parses."""
+    legacy_extract_links(html)
+    return len(legacy_clean_text(html))
+
+def make_page(index: int, depth: int) -> str:
+    """A synthetic page with navigation, nested layout divs and content paragraphs."""
+    nav = "".join(f'<li><a href="/section-{i}">Section {i} overview</a></li>' for i in range(20))
+    content = "".join(
+        f"<p>Paragraph {j} of page {index} describes product SKU-{index}-{j} in some detail. "
+        f"<span>Contact sales@example.com for pricing.</span></p>"
+        for j in range(30)
+    )
+    for level in range(depth):
+        content = f'<div class="layout-{level}"><span>Level {level} wrapper text</span>{content}</div>'
+    return (
+        "<html><head><title>Page</title><style>body{color:red}</style></head><body>"
+        f"<nav><ul>{nav}</ul></nav>{content}"
+        "<script>var tracking = 'not text';</script><footer><p>Copyright Example Inc. All rights reserved.</p></footer>"
+        "</body></html>"
+    )
+
+def run(name, fn, pages):
+    start = time.perf_counter()
+    output_chars = 0
+    for html in pages:
+        output_chars += fn(html)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:8.3f}s  {len(pages) / elapsed:8.1f} pages/s  {output_chars:>10} chars out")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=6)
+    args = parser.parse_args()
+
+    pages = [make_page(i, args.depth) for i in range(args.pages)]
+    print(f"{args.pages} pages, nesting depth {args.depth}, {sum(map(len, pages))} HTML chars")
+
+    run("legacy clean_text + links", legacy_crawl_parse, pages)
+    run("legacy clean_text only", lambda h: len(legacy_clean_text(h)), pages)
+    run("extract_page (lxml)", lambda h: len("\n".join(extract_page(h, "https://example.com").blocks)), pages)
+
+if __name__ == "__main__":
+    main()
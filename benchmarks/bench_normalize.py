@@ -0,0 +1,75 @@
+"""Benchmark the single-pass text normalizer against the previous three-pass preprocess_text.
+
+Usage:
+    python -m benchmarks.bench_normalize [--mb 20] [--contact-rate 0.03] [--file document.txt]
+
+Without --file, synthetic extracted text with line breaks is generated,
+with emails, URLs, phone numbers and symbols as --contact-rate of the
+words. Peak memory is measured in a second, traced run so it does not
+slow down the timings.
+"""
+import argparse
+import random
+import re
+import time
+import tracemalloc
+
+from app.utils.normalize import normalize_stream, normalize_text
+
+def legacy_preprocess_text(text: str) -> str:
+    """preprocess_text as it was before the single-pass normalizer."""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s.,!?-]', '', text)
+    text = re.sub(r'\s+([.,!?])', r'\1', text)
+    return text.strip()
+
+def make_text(megabytes: float, contact_rate: float = 0.03) -> str:
+    rng = random.Random(0)
+    words = "the product ships within three working days and includes a warranty for parts labour".split()
+    extras = ["sales@example.com", "https://example.com/support?id=42", "+1 (555) 123-4567", "(c)", "$49.99", "—", "50%"]
+    lines = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        line = " ".join(rng.choice(extras) if rng.random() < contact_rate else rng.choice(words) for _ in range(rng.randint(6, 14)))
+        line = line.capitalize() + rng.choice([".", ".", "!", " ?", ":"])
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+def pieces(text: str, size: int = 256 * 1024):
+    return (text[start:start + size] for start in range(0, len(text), size))
+
+def run(name: str, function, text: str) -> None:
+    start = time.perf_counter()
+    function(text)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    megabytes = len(text) / 1024 / 1024
+    print(f"{name:<16} {elapsed:7.2f}s  {megabytes / elapsed:7.1f} MB/s  peak {peak / 1024 / 1024:7.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", help="UTF-8 text file to normalize instead of synthetic text")
+    parser.add_argument("--mb", type=float, default=20)
+    parser.add_argument("--contact-rate", type=float, default=0.03)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = make_text(args.mb, args.contact_rate)
+
+    print(f"{len(text) / 1024 / 1024:.1f} MB of text")
+    run("legacy", legacy_preprocess_text, text)
+    run("single-pass", normalize_text, text)
+    run("single-pass/none", lambda t: normalize_text(t, preserve=()), text)
+    # Consumed piece by piece, as the chunker does; only pieces with
+    # contact details pay for the preserving alternatives
+    run("stream", lambda t: sum(len(piece) for piece in normalize_stream(pieces(t))), text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark PDF page extraction with 1 versus N worker processes.
+
+Usage:
+    python -m benchmarks.bench_pdf [--pages 400] [--workers 1 2 4]
+    python -m benchmarks.bench_pdf --pdf catalogue.pdf
+
+Without --pdf, a synthetic text PDF with --pages pages is generated.
+"""
+import argparse
+import io
+import time
+
+from app.utils.process_files import iter_pdf_pages
+
+def make_pdf(pages: int, lines_per_page: int = 45) -> bytes:
+    """A minimal multi-page PDF with Helvetica text lines on every page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for index in range(pages):
+        lines = "".join(
+            f"(Page {index} line {line}: product SKU-{index}-{line} ships within three working days.) Tj T* "
+            for line in range(lines_per_page)
+        )
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td {lines}ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", help="PDF file to extract instead of a synthetic one")
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            data = f.read()
+    else:
+        data = make_pdf(args.pages)
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        pages = sum(1 for _ in iter_pdf_pages(io.BytesIO(data), workers=workers))
+        elapsed = time.perf_counter() - start
+        print(f"{workers} worker(s): {pages} pages in {elapsed:7.2f}s  {pages / elapsed:8.1f} pages/s")
+
+if __name__ == "__main__":
+    main()
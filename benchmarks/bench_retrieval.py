@@ -0,0 +1,139 @@
+"""Compare chunking settings by retrieval quality, chunk count and embedding time.
+
+Each setting chunks the same corpus, embeds it with the production
+embedding model and answers every query by cosine similarity. A query is a
+hit when one of the top-k chunks contains its answer string.
+
+Usage:
+    python -m benchmarks.bench_retrieval [--pages 100] [--markdown]
+    python -m benchmarks.bench_retrieval --corpus docs/ --queries queries.jsonl
+
+--markdown prints the results as a table to paste into the README next to
+CHUNK_TARGET_TOKENS / CHUNK_OVERLAP_TOKENS when their defaults change.
+
+With --corpus, every *.txt file in the directory is a document and
+--queries is a JSONL file of {"question": ..., "answer": ...} lines.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from app.services.chunking import CHUNK_OVERLAP_TOKENS, CHUNK_TARGET_TOKENS, chunk_text
+from app.services.embeddings import get_embeddings, get_question_embedding
+from app.utils.common import create_chunks
+
+SETTINGS = [
+    ("chars 64/10 (old scrape path)", lambda text: create_chunks(text, chunk_size=64, overlap=10)),
+    ("chars 1000/200 (old upload path)", lambda text: create_chunks(text, chunk_size=1000, overlap=200)),
+    ("tokens 96/16", lambda text: chunk_text(text, 96, 16)),
+    ("tokens 128/16", lambda text: chunk_text(text, 128, 16)),
+    ("tokens 192/32", lambda text: chunk_text(text, 192, 32)),
+    ("tokens 254/48", lambda text: chunk_text(text, 254, 48)),
+]
+if f"tokens {CHUNK_TARGET_TOKENS}/{CHUNK_OVERLAP_TOKENS}" not in dict(SETTINGS):
+    SETTINGS.append((f"tokens {CHUNK_TARGET_TOKENS}/{CHUNK_OVERLAP_TOKENS}", lambda text: chunk_text(text)))
+
+FILLER = [
+    "Our team has been serving customers across the region for many years.",
+    "We believe quality and reliability matter more than anything else.",
+    "Browse the catalogue to find the right option for your home or office.",
+    "Every order is packed carefully and checked before it leaves the warehouse.",
+    "Sign up to the newsletter to hear about new releases and seasonal offers.",
+    "Installation guides and manuals are available on each product page.",
+    "Customers often combine several accessories to get the most out of their purchase.",
+    "Feedback from our community shapes the features we build next.",
+]
+
+def make_corpus(pages: int, seed: int = 7):
+    """Synthetic product pages, each hiding a few facts among filler text."""
+    rng = random.Random(seed)
+    documents, queries = [], []
+    for i in range(pages):
+        product = f"Model {chr(65 + i % 26)}{chr(65 + i // 26 % 26)}-{100 + i}"
+        months, price, days = rng.randint(6, 60), rng.randint(50, 5000), rng.randint(2, 14)
+        facts = [
+            f"The {product} warranty covers parts and labour for {months} months from delivery.",
+            f"The {product} currently costs {price} dollars including tax.",
+            f"Orders for the {product} usually ship within {days} business days.",
+        ]
+        sentences = [rng.choice(FILLER) for _ in range(40)]
+        for fact in facts:
+            sentences.insert(rng.randrange(len(sentences)), fact)
+        paragraphs = [" ".join(sentences[j:j + 5]) for j in range(0, len(sentences), 5)]
+        documents.append("\n".join(paragraphs))
+        queries += [
+            (f"How long is the warranty on the {product}?", f"{months} months"),
+            (f"What is the price of the {product}?", f"{price} dollars"),
+            (f"How quickly does the {product} ship?", f"{days} business days"),
+        ]
+    return documents, queries
+
+def load_corpus(corpus_dir: str, queries_path: str):
+    documents = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            documents.append(f.read())
+    with open(queries_path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    queries = [(row["question"], row["answer"]) for row in rows]
+    return documents, queries
+
+def evaluate(chunker, documents, query_vectors, answers, k: int):
+    chunks = [chunk for document in documents for chunk in chunker(document) if chunk.strip()]
+    start = time.perf_counter()
+    vectors = np.asarray(get_embeddings(chunks), dtype=np.float32)
+    embed_seconds = time.perf_counter() - start
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    ranked = np.argsort(-(query_vectors @ vectors.T), axis=1)[:, :10]
+    hits_1 = hits_k = reciprocal_rank = 0.0
+    for row, answer in zip(ranked, answers):
+        for rank, index in enumerate(row):
+            if answer.lower() in chunks[index].lower():
+                hits_1 += rank == 0
+                hits_k += rank < k
+                reciprocal_rank += 1 / (rank + 1)
+                break
+    n = len(answers)
+    return len(chunks), embed_seconds, hits_1 / n, hits_k / n, reciprocal_rank / n
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--corpus")
+    parser.add_argument("--queries")
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--markdown", action="store_true", help="print a Markdown table")
+    args = parser.parse_args()
+
+    if args.corpus:
+        documents, queries = load_corpus(args.corpus, args.queries)
+    else:
+        documents, queries = make_corpus(args.pages)
+    questions, answers = zip(*queries)
+    query_vectors = np.asarray([get_question_embedding(q) for q in questions], dtype=np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    print(f"{len(documents)} documents, {len(queries)} queries")
+
+    default = f"tokens {CHUNK_TARGET_TOKENS}/{CHUNK_OVERLAP_TOKENS}"
+    if args.markdown:
+        print(f"| Setting | Chunks | Embed s | hit@1 | hit@{args.k} | MRR@10 |")
+        print("| --- | ---: | ---: | ---: | ---: | ---: |")
+    else:
+        print(f"{'setting':<34} {'chunks':>7} {'embed s':>8} {'hit@1':>6} {f'hit@{args.k}':>6} {'MRR@10':>7}")
+    for name, chunker in SETTINGS:
+        chunks, seconds, hit_1, hit_k, mrr = evaluate(chunker, documents, query_vectors, answers, args.k)
+        if name == default:
+            name += " (default)"
+        if args.markdown:
+            print(f"| {name} | {chunks} | {seconds:.2f} | {hit_1:.2f} | {hit_k:.2f} | {mrr:.3f} |")
+        else:
+            print(f"{name:<34} {chunks:>7} {seconds:>8.2f} {hit_1:>6.2f} {hit_k:>6.2f} {mrr:>7.3f}")
+
+if __name__ == "__main__":
+    main()
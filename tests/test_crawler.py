@@ -0,0 +1,40 @@
+import asyncio
+import functools
+
+import httpx
+
+from app.utils import crawler
+
+SITE = {
+    "/": '<html><body><p>Home</p><a href="http://example.com:80a/x">bad port</a>'
+         '<a href="http://example.com:99999/y">out of range</a><a href="/about">About</a></body></html>',
+    "/about": "<html><body><p>About us</p></body></html>",
+    "/sitemap.xml": '<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                    "<url><loc>http://example.com:80a/from-sitemap</loc></url>"
+                    "<url><loc>http://example.com/contact</loc></url></urlset>",
+    "/contact": "<html><body><p>Contact</p></body></html>",
+}
+
+def handler(request: httpx.Request) -> httpx.Response:
+    body = SITE.get(request.url.path)
+    if body is None:
+        return httpx.Response(404)
+    content_type = "application/xml" if request.url.path.endswith(".xml") else "text/html"
+    return httpx.Response(200, text=body, headers={"Content-Type": content_type})
+
+async def collect(start_url: str):
+    return [page async for page in crawler.crawl_pages(start_url)]
+
+def test_malformed_links_are_skipped(monkeypatch):
+    transport = httpx.MockTransport(handler)
+    monkeypatch.setattr(crawler.httpx, "AsyncClient", functools.partial(httpx.AsyncClient, transport=transport))
+    monkeypatch.setattr(crawler, "CRAWL_RESPECT_ROBOTS", False)
+    monkeypatch.setattr(crawler, "CRAWL_USE_SITEMAPS", True)
+
+    pages = asyncio.run(asyncio.wait_for(collect("http://example.com/"), timeout=10))
+
+    assert sorted(page.url for page in pages) == [
+        "http://example.com/",
+        "http://example.com/about",
+        "http://example.com/contact",
+    ]
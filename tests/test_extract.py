@@ -0,0 +1,12 @@
+from app.utils.extract import extract_page
+
+def test_malformed_href_skips_only_that_link():
+    html = (
+        "<html><body><p>Shipping takes three to five business days.</p>"
+        '<a href="http://[::1/x">broken</a><a href="/contact">Contact</a></body></html>'
+    )
+
+    page = extract_page(html, "http://example.com/docs/")
+
+    assert page.links == ["http://example.com/contact"]
+    assert page.blocks